@@ -1,22 +1,49 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, g, Response, has_request_context
 import pymysql
 from datetime import datetime, timedelta
+from decimal import Decimal
 import os
 from dotenv import load_dotenv
 import hashlib
+import hmac
 import secrets
 import random
+import re
+import time
+import calendar
+from functools import wraps, lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from flask.json.provider import DefaultJSONProvider
+from dbutils.pooled_db import PooledDB
+import orjson
 from werkzeug.utils import secure_filename
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError, InvalidHashError
 
 # Load environment variables
 load_dotenv()
 
+class OrjsonProvider(DefaultJSONProvider):
+    """Serve jsonify() and request.get_json() through orjson, keeping Flask's
+    conversions for dates, Decimal and other types orjson leaves to default"""
+    dumps_option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.dumps_option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 
 # Configure upload folder for profile photos
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+ALLOWED_SUFFIXES = tuple(f'.{extension}' for extension in ALLOWED_EXTENSIONS)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
@@ -30,18 +57,279 @@ DB_CONFIG = {
     'password': os.environ.get('DB_PASSWORD', ''),
     'database': os.environ.get('DB_NAME', 'hotel_pos'),
     'charset': 'utf8mb4',
-    'use_unicode': True
+    'use_unicode': True,
+    # Reads never open a transaction; writers start one explicitly (see RequestConnection)
+    'autocommit': True
 }
 
+# MySQL error code for a duplicate value in a unique index
+DUPLICATE_KEY_ERROR = 1062
+# MySQL error code for deleting a row that a foreign key still references
+ROW_REFERENCED_ERROR = 1451
+
+# Pool sizing, per worker process; tune via environment for the deployment
+DB_POOL_MIN_CACHED = int(os.environ.get('DB_POOL_MIN_CACHED', 4))
+DB_POOL_MAX_CACHED = int(os.environ.get('DB_POOL_MAX_CACHED', 16))
+DB_POOL_MAX_CONNECTIONS = int(os.environ.get('DB_POOL_MAX_CONNECTIONS', 32))
+
+# Shared pool of authenticated connections; created on first use so the app
+# can still start while the database is unavailable
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """Return the process-wide database connection pool"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = PooledDB(
+                    creator=pymysql,
+                    mincached=DB_POOL_MIN_CACHED,
+                    maxcached=DB_POOL_MAX_CACHED,
+                    maxconnections=DB_POOL_MAX_CONNECTIONS,
+                    blocking=True,
+                    # Only roll back connections returned mid-transaction
+                    reset=False,
+                    **DB_CONFIG
+                )
+    return _db_pool
+
 def get_db_connection():
-    """Create and return a database connection"""
+    """Lease a database connection from the pool; close() hands it back.
+
+    Inside a request the same connection is returned to every caller, so a
+    page that also loads settings or a profile photo uses one connection.
+
+    Cursors default to the buffered client-side cursor, which reads the whole
+    result in one go and frees the connection quickly; use it for summaries
+    and charts. Reserve pymysql.cursors.SSCursor for unbounded listings that
+    are streamed row by row (e.g. the receipts page).
+    """
     try:
-        connection = pymysql.connect(**DB_CONFIG)
+        # Within a request every caller shares one leased connection, released
+        # at teardown; worker threads and startup code lease their own
+        if has_request_context():
+            if 'db' not in g:
+                g.db = get_db_pool().connection()
+            return RequestConnection(g.db)
+        connection = get_db_pool().connection()
         return connection
     except Exception as e:
         print(f"Database connection error: {e}")
         return None
 
+# Request methods served without a transaction; anything else writes
+READ_ONLY_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+class RequestConnection:
+    """The request's shared pooled connection; close() is left to request teardown.
+
+    Connections run in autocommit mode, so read-only requests skip the
+    BEGIN/ROLLBACK pair entirely. For write requests the first cursor after
+    each commit or rollback opens a transaction, keeping multi-statement
+    writes atomic as before.
+    """
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        if request.method not in READ_ONLY_METHODS and not g.get('db_transaction'):
+            self._connection.begin()
+            g.db_transaction = True
+        return self._connection.cursor(*args, **kwargs)
+
+    def commit(self):
+        g.db_transaction = False
+        self._connection.commit()
+
+    def rollback(self):
+        g.db_transaction = False
+        self._connection.rollback()
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    """Hand the request's connection back to the pool, rolling back anything uncommitted"""
+    g.pop('db_transaction', None)
+    connection = g.pop('db', None)
+    if connection is not None:
+        connection.close()
+
+# Upper bound on parallel connections a single analytics request may hold
+ANALYTICS_QUERY_WORKERS = 6
+
+def fetch_query_rows(query, params=None, cursor_class=None):
+    """Run a read-only query on its own connection and return all rows"""
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError('Database connection failed')
+    try:
+        with connection.cursor(cursor_class) as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+    finally:
+        connection.close()
+
+def run_queries_concurrently(queries, cursor_class=None):
+    """Execute independent {name: (query, params)} lookups in parallel and return {name: rows}.
+
+    Each query gets its own connection, so total latency is that of the slowest
+    query rather than the sum of all of them. Callers must not be holding the
+    request's shared connection: with every pool slot taken by requests
+    waiting on their workers, the blocking pool would never hand one out.
+    """
+    if not queries:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(ANALYTICS_QUERY_WORKERS, len(queries))) as executor:
+        futures = {name: executor.submit(fetch_query_rows, query, params, cursor_class)
+                   for name, (query, params) in queries.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+def _json_default(value):
+    """Serialize values orjson does not handle natively (MySQL DECIMAL aggregates)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def json_response(payload, status=200):
+    """Build a JSON response with orjson; used by the analytics, cached
+    dashboard and item list endpoints, whose payloads are built straight
+    from query rows"""
+    return Response(orjson.dumps(payload, default=_json_default, option=orjson.OPT_NON_STR_KEYS),
+                    status=status, mimetype='application/json')
+
+def revenue_chart_query(where_clause, filter_type):
+    """Build the revenue-over-time chart query for the analytics pages.
+
+    A single day is bucketed by hour, longer periods by day; rows come back
+    as (bucket, label, revenue) ordered by bucket, with the label already
+    formatted by MySQL.
+    """
+    if filter_type == 'single':
+        bucket_expr = "HOUR(s.sale_date)"
+        label_expr = f"CONCAT({bucket_expr}, ':00')"
+    else:
+        bucket_expr = "DATE(s.sale_date)"
+        label_expr = f"DATE_FORMAT({bucket_expr}, '%%m/%%d')"
+    return f"""
+        SELECT 
+            {bucket_expr} as bucket,
+            {label_expr} as label,
+            COALESCE(SUM(s.total_amount), 0) as revenue
+        FROM sales s
+        WHERE {where_clause}
+        GROUP BY bucket
+        ORDER BY bucket
+    """
+
+def build_revenue_chart(rows):
+    """Turn revenue_chart_query rows into the chart payload used by the analytics pages"""
+    return {'labels': [row['label'] for row in rows], 'revenue': [row['revenue'] for row in rows]}
+
+# Response keys for analytics rows whose columns map one-to-one onto the payload
+ITEM_PAIR_KEYS = ('item1', 'item2', 'count')
+EMPLOYEE_ACTIVITY_KEYS = ('name', 'sales', 'revenue')
+
+# Monthly quantity trend over a 12-month calendar (first and current month start
+# as parameters). The months CTE yields a row per month even without sales, and
+# the ROLLUP row (month NULL) carries the 12-month total
+MONTHLY_TREND_QUERY_TEMPLATE = """
+    WITH RECURSIVE months (month_start) AS (
+        SELECT CAST(%s AS DATE)
+        UNION ALL
+        SELECT month_start + INTERVAL 1 MONTH
+        FROM months
+        WHERE month_start < %s
+    )
+    SELECT 
+        DATE_FORMAT(m.month_start, '%%Y-%%m') as month,
+        DATE_FORMAT(m.month_start, '%%b %%Y') as label,
+        COALESCE(SUM(si.quantity), 0) as total_quantity
+    FROM months m
+    LEFT JOIN (sales s JOIN sales_items si ON s.id = si.sale_id)
+        ON s.sale_date >= m.month_start
+        AND s.sale_date < m.month_start + INTERVAL 1 MONTH{status_condition}
+    GROUP BY m.month_start WITH ROLLUP
+"""
+# 'general' includes all statuses (pending, confirmed, cancelled)
+MONTHLY_TREND_QUERIES = {
+    'general': MONTHLY_TREND_QUERY_TEMPLATE.format(status_condition=''),
+    'verified': MONTHLY_TREND_QUERY_TEMPLATE.format(status_condition="\n        AND s.status = 'confirmed'"),
+}
+
+# Manager dashboard payloads are polled on a timer by every open dashboard, so
+# each process keeps the rendered JSON briefly and drops it when sales change
+DASHBOARD_CACHE_TTL = 30
+_dashboard_cache = {}
+_sales_version = {'value': 0}
+
+def current_sales_version():
+    """Return the counter bumped on every sale write; read it before computing a payload"""
+    return _sales_version['value']
+
+def get_cached_dashboard_payload(key):
+    """Return cached JSON bytes for key, or None if missing, expired or outdated"""
+    entry = _dashboard_cache.get(key)
+    if entry and entry[0] == _sales_version['value'] and time.time() - entry[1] < DASHBOARD_CACHE_TTL:
+        return entry[2]
+    return None
+
+def cache_dashboard_payload(key, payload, version):
+    """Store JSON bytes computed while the sales counter was at version"""
+    _dashboard_cache[key] = (version, time.time(), payload)
+
+def invalidate_dashboard_cache():
+    """Mark every cached dashboard payload as outdated after sales change"""
+    _sales_version['value'] += 1
+
+@lru_cache(maxsize=256)
+def date_bounds(filter_type, first, second=''):
+    """Return the half-open (start, end) sale_date range for an analytics date filter.
+
+    'single' takes a YYYY-MM-DD date, 'range' a from/to pair of dates (inclusive),
+    'month' a YYYY-MM string and 'year' a four-digit year. Comparing the raw
+    column against these bounds keeps the predicates index-friendly.
+    """
+    if filter_type == 'single':
+        start = datetime.strptime(first, '%Y-%m-%d')
+        return start, start + timedelta(days=1)
+    if filter_type == 'range':
+        return datetime.strptime(first, '%Y-%m-%d'), datetime.strptime(second, '%Y-%m-%d') + timedelta(days=1)
+    if filter_type == 'month':
+        start = datetime.strptime(first, '%Y-%m')
+        if start.month == 12:
+            return start, start.replace(year=start.year + 1, month=1)
+        return start, start.replace(month=start.month + 1)
+    if filter_type == 'year':
+        start = datetime(int(first), 1, 1)
+        return start, start.replace(year=start.year + 1)
+    raise ValueError(f"Unknown date filter: {filter_type}")
+
+# Analytics date filters: filterType -> request fields passed on to date_bounds()
+ANALYTICS_DATE_FILTERS = {
+    'single': ('singleDate',),
+    'range': ('fromDate', 'toDate'),
+    'month': ('month',),
+    'year': ('year',),
+}
+ANALYTICS_DATE_CONDITION = "s.sale_date >= %s AND s.sale_date < %s"
+
+def analytics_date_params(data, filter_type):
+    """Return the sale_date bounds for an analytics request, or None if the filter is incomplete"""
+    fields = ANALYTICS_DATE_FILTERS.get(filter_type)
+    if not fields:
+        return None
+    values = [data.get(field) for field in fields]
+    if not all(values):
+        return None
+    return date_bounds(filter_type, *(str(value) for value in values))
+
 def safe_encode_string(text):
     """Safely encode a string to avoid Unicode encoding issues"""
     if text is None:
@@ -164,16 +452,23 @@ def check_and_auto_close_sessions():
         print(f"Error auto-closing sessions: {e}")
         return False
 
+DB_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_]+$')
+
 def create_database():
     """Create database if it doesn't exist"""
     # Connect without specifying database
     db_config_no_db = DB_CONFIG.copy()
     db_config_no_db.pop('database', None)
     
+    # The name is interpolated into DDL, so only allow plain identifiers
+    if not DB_NAME_PATTERN.match(DB_CONFIG['database']):
+        print(f"Database creation error: invalid database name '{DB_CONFIG['database']}'")
+        return False
+    
     try:
         connection = pymysql.connect(**db_config_no_db)
         with connection.cursor() as cursor:
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_CONFIG['database']}")
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{DB_CONFIG['database']}`")
             connection.commit()
             print(f"Database '{DB_CONFIG['database']}' created or already exists")
         connection.close()
@@ -182,6 +477,179 @@ def create_database():
         print(f"Database creation error: {e}")
         return False
 
+# Columns added to existing tables after their first release, as
+# (column name, column definition) pairs; init_database adds any that are missing
+STOCK_TRANSACTION_MIGRATION_COLUMNS = (
+    ('price_per_unit', 'DECIMAL(10,2)'),
+    ('total_amount', 'DECIMAL(10,2)'),
+    ('place_purchased_from', 'VARCHAR(255)'),
+    ('employee_id', 'INT'),
+    ('employee_name', 'VARCHAR(255)'),
+    ('transaction_type', "ENUM('purchase', 'sale', 'return', 'waste') DEFAULT 'purchase'"),
+    ('selling_price', 'DECIMAL(10,2)'),
+    ('refund_issued', 'BOOLEAN DEFAULT FALSE')
+)
+
+HOTEL_SETTINGS_MIGRATION_COLUMNS = (
+    ('business_type', 'VARCHAR(100) AFTER hotel_address'),
+    ('double_print', 'BOOLEAN DEFAULT FALSE'),
+    ('show_till', 'BOOLEAN DEFAULT TRUE'),
+    ('include_tax', 'BOOLEAN DEFAULT TRUE'),
+    ('show_images', 'BOOLEAN DEFAULT TRUE'),
+    # Receipt settings
+    ('receipt_width', "VARCHAR(20) DEFAULT '58mm'"),
+    ('receipt_font_size', "VARCHAR(20) DEFAULT 'medium'"),
+    ('receipt_bold_headers', 'BOOLEAN DEFAULT TRUE'),
+    ('receipt_number_format', "VARCHAR(20) DEFAULT 'sequential'"),
+    ('receipt_number_prefix', "VARCHAR(10) DEFAULT 'POS'"),
+    ('receipt_starting_number', 'INT DEFAULT 1001'),
+    ('receipt_header_title', 'VARCHAR(255)'),
+    ('receipt_header_subtitle', 'VARCHAR(255)'),
+    ('receipt_header_message', 'TEXT'),
+    ('receipt_show_logo', 'BOOLEAN DEFAULT FALSE'),
+    ('receipt_show_address', 'BOOLEAN DEFAULT TRUE'),
+    ('receipt_show_contact', 'BOOLEAN DEFAULT TRUE'),
+    ('receipt_footer_message', 'TEXT'),
+    ('receipt_show_datetime', 'BOOLEAN DEFAULT TRUE'),
+    ('receipt_show_cashier', 'BOOLEAN DEFAULT TRUE'),
+    ('receipt_show_payment', 'BOOLEAN DEFAULT TRUE'),
+    ('receipt_show_qr', 'BOOLEAN DEFAULT FALSE'),
+    ('enable_receipt_status_update', 'BOOLEAN DEFAULT TRUE'),
+    ('receipt_address', 'TEXT'),
+    ('receipt_phone', 'VARCHAR(50)'),
+    ('receipt_email', 'VARCHAR(255)'),
+    ('receipt_logo_url', 'VARCHAR(500)')
+)
+
+def get_table_columns(cursor, table_name):
+    """Map each column of a table in the current database to its character length (None for non-text columns)"""
+    cursor.execute("""
+        SELECT COLUMN_NAME, CHARACTER_MAXIMUM_LENGTH
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table_name,))
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+# MySQL error codes init_database expects when it is re-run on an existing schema
+DUPLICATE_COLUMN_ERROR = 1060
+TRIGGER_EXISTS_ERROR = 1359
+
+def install_triggers(cursor, triggers):
+    """Create whichever of the given {name: CREATE TRIGGER sql} triggers are missing.
+
+    Returns (all_installed, created_any). Failures other than "already exists"
+    are logged rather than ignored: creation fails with 1419 under binary
+    logging without SUPER or log_bin_trust_function_creators, or with 1142
+    without the TRIGGER privilege, and a summary table whose triggers are
+    missing silently goes stale.
+    """
+    existing = get_trigger_names(cursor)
+    all_installed = True
+    created_any = False
+    for name, trigger_sql in triggers.items():
+        if name in existing:
+            continue
+        try:
+            cursor.execute(trigger_sql)
+            created_any = True
+        except pymysql.err.MySQLError as e:
+            if e.args[0] == TRIGGER_EXISTS_ERROR:
+                continue
+            all_installed = False
+            app.logger.error("Could not create trigger %s: %s", name, e)
+    # Let request handlers see the new state straight away
+    _installed_triggers['ts'] = float('-inf')
+    return all_installed, created_any
+
+def get_trigger_names(cursor):
+    """Names of the triggers defined in the current database"""
+    cursor.execute("SELECT TRIGGER_NAME FROM information_schema.TRIGGERS WHERE TRIGGER_SCHEMA = DATABASE()")
+    return {row[0] for row in cursor.fetchall()}
+
+# Summary tables are only read while their triggers exist. The answer comes
+# from the schema, so processes that skipped init_database agree with it.
+INSTALLED_TRIGGERS_CACHE_TTL = 300
+_installed_triggers = {'names': frozenset(), 'ts': float('-inf')}
+
+def triggers_installed(names):
+    """True if every named trigger exists; False (read live tables) when unsure"""
+    if time.monotonic() - _installed_triggers['ts'] >= INSTALLED_TRIGGERS_CACHE_TTL:
+        # Leased straight from the pool and handed back at once rather than
+        # taking the request's connection, which would stay held until
+        # teardown while run_queries_concurrently() waits on pool slots
+        try:
+            connection = get_db_pool().connection()
+        except Exception as e:
+            app.logger.exception("Error reading installed triggers: %s", e)
+            return False
+        try:
+            with connection.cursor() as cursor:
+                _installed_triggers['names'] = frozenset(get_trigger_names(cursor))
+                _installed_triggers['ts'] = time.monotonic()
+        except Exception as e:
+            app.logger.exception("Error reading installed triggers: %s", e)
+            return False
+        finally:
+            connection.close()
+    return names <= _installed_triggers['names']
+
+SALES_ROLLUP_TRIGGERS = frozenset((
+    'trg_sales_rollup_insert', 'trg_sales_rollup_update', 'trg_sales_rollup_delete',
+    'trg_sales_items_rollup_insert', 'trg_sales_items_rollup_delete',
+))
+
+# Same shape as sales_rollup_hourly, computed from the sales tables for when the
+# rollup's triggers are missing; limited to the 12 months the dashboard reads
+LIVE_SALES_ROLLUP_HOURLY = """(
+    SELECT 
+        CAST(DATE_FORMAT(s.sale_date, '%%Y-%%m-%%d %%H:00:00') AS DATETIME) as hour_ts,
+        s.employee_id,
+        COALESCE(s.status, '') as status,
+        COUNT(DISTINCT s.id) as tx_count,
+        COALESCE(SUM(si.quantity), 0) as qty,
+        COALESCE(SUM(si.total_price), 0) as revenue
+    FROM sales s
+    LEFT JOIN sales_items si ON si.sale_id = s.id
+    WHERE s.sale_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
+    GROUP BY hour_ts, s.employee_id, COALESCE(s.status, '')
+)"""
+
+def sales_rollup_source():
+    """Table (or derived table) to read hourly sales aggregates from; queries using it take parameters"""
+    if triggers_installed(SALES_ROLLUP_TRIGGERS):
+        return 'sales_rollup_hourly'
+    return LIVE_SALES_ROLLUP_HOURLY
+
+EMPLOYEE_DAY_SALES_TRIGGERS = frozenset((
+    'trg_employee_day_sales_insert', 'trg_employee_day_sales_update', 'trg_employee_day_sales_delete',
+))
+
+# Same shape as employee_day_sales, computed from sales for when its triggers are missing
+LIVE_EMPLOYEE_DAY_SALES = """(
+    SELECT 
+        employee_id,
+        DATE(sale_date) as sale_day,
+        COALESCE(status, '') as status,
+        COUNT(*) as tx_count,
+        COALESCE(SUM(total_amount), 0) as revenue
+    FROM sales
+    GROUP BY employee_id, DATE(sale_date), COALESCE(status, '')
+)"""
+
+def employee_day_sales_source():
+    """Table (or derived table) to read per-employee daily sales from"""
+    if triggers_installed(EMPLOYEE_DAY_SALES_TRIGGERS):
+        return 'employee_day_sales'
+    return LIVE_EMPLOYEE_DAY_SALES
+
+ITEM_COUNT_TRIGGERS = frozenset(('trg_sales_items_count_insert', 'trg_sales_items_count_delete'))
+
+def sale_item_count_column():
+    """Select expression for a sale's line count (sales aliased as s)"""
+    if triggers_installed(ITEM_COUNT_TRIGGERS):
+        return 's.item_count'
+    return '(SELECT COUNT(*) FROM sales_items si WHERE si.sale_id = s.id) as item_count'
+
 def init_database():
     """Initialize database tables"""
     # First, try to create the database
@@ -191,8 +659,16 @@ def init_database():
     
     connection = get_db_connection()
     if connection:
+        init_lock_acquired = False
         try:
             with connection.cursor() as cursor:
+                # Only one process sets up the schema at a time; the others skip it
+                cursor.execute("SELECT GET_LOCK('hotel_pos_init_database', 0)")
+                init_lock_acquired = cursor.fetchone()[0] == 1
+                if not init_lock_acquired:
+                    print("Database initialization already running in another process, skipping")
+                    return
+                
                 # Create employees table
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS employees (
@@ -248,9 +724,9 @@ def init_database():
                     )
                 """)
                 
-                # Check if low_stock_threshold column exists and add it if it doesn't
-                cursor.execute("SHOW COLUMNS FROM items LIKE 'low_stock_threshold'")
-                if not cursor.fetchone():
+                # Read the items columns once instead of probing each with SHOW COLUMNS
+                item_columns = get_table_columns(cursor, 'items')
+                if 'low_stock_threshold' not in item_columns:
                     try:
                         cursor.execute("ALTER TABLE items ADD COLUMN low_stock_threshold INT DEFAULT 10")
                         print("Added low_stock_threshold column to items table")
@@ -273,52 +749,32 @@ def init_database():
                 """)
                 
                 # Check if new columns exist and add them if they don't
-                cursor.execute("SHOW COLUMNS FROM stock_transactions LIKE 'price_per_unit'")
-                if not cursor.fetchone():
-                    cursor.execute("ALTER TABLE stock_transactions ADD COLUMN price_per_unit DECIMAL(10,2)")
-                
-                cursor.execute("SHOW COLUMNS FROM stock_transactions LIKE 'total_amount'")
-                if not cursor.fetchone():
-                    cursor.execute("ALTER TABLE stock_transactions ADD COLUMN total_amount DECIMAL(10,2)")
-                
-                cursor.execute("SHOW COLUMNS FROM stock_transactions LIKE 'place_purchased_from'")
-                if not cursor.fetchone():
-                    cursor.execute("ALTER TABLE stock_transactions ADD COLUMN place_purchased_from VARCHAR(255)")
-                
-                cursor.execute("SHOW COLUMNS FROM stock_transactions LIKE 'employee_id'")
-                if not cursor.fetchone():
-                    cursor.execute("ALTER TABLE stock_transactions ADD COLUMN employee_id INT")
-                
-                cursor.execute("SHOW COLUMNS FROM stock_transactions LIKE 'employee_name'")
-                if not cursor.fetchone():
-                    cursor.execute("ALTER TABLE stock_transactions ADD COLUMN employee_name VARCHAR(255)")
+                stock_transaction_columns = get_table_columns(cursor, 'stock_transactions')
+                for column_name, column_definition in STOCK_TRANSACTION_MIGRATION_COLUMNS:
+                    if column_name not in stock_transaction_columns:
+                        cursor.execute(f"ALTER TABLE stock_transactions ADD COLUMN {column_name} {column_definition}")
                 
-                cursor.execute("SHOW COLUMNS FROM stock_transactions LIKE 'transaction_type'")
-                if not cursor.fetchone():
-                    cursor.execute("ALTER TABLE stock_transactions ADD COLUMN transaction_type ENUM('purchase', 'sale', 'return', 'waste') DEFAULT 'purchase'")
-                
-                cursor.execute("SHOW COLUMNS FROM stock_transactions LIKE 'selling_price'")
-                if not cursor.fetchone():
-                    cursor.execute("ALTER TABLE stock_transactions ADD COLUMN selling_price DECIMAL(10,2)")
-                
-                cursor.execute("SHOW COLUMNS FROM stock_transactions LIKE 'refund_issued'")
-                if not cursor.fetchone():
-                    cursor.execute("ALTER TABLE stock_transactions ADD COLUMN refund_issued BOOLEAN DEFAULT FALSE")
-                
-                # Update reason column to be longer if it exists
-                cursor.execute("SHOW COLUMNS FROM stock_transactions LIKE 'reason'")
-                if cursor.fetchone():
+                # Update reason column to be longer if it hasn't been widened yet
+                if 'reason' in stock_transaction_columns and stock_transaction_columns['reason'] < 500:
                     cursor.execute("ALTER TABLE stock_transactions MODIFY COLUMN reason VARCHAR(500)")
                 
                 # Add stock update toggle column to items table
-                cursor.execute("SHOW COLUMNS FROM items LIKE 'stock_update_enabled'")
-                if not cursor.fetchone():
+                if 'stock_update_enabled' not in item_columns:
                     cursor.execute("ALTER TABLE items ADD COLUMN stock_update_enabled BOOLEAN DEFAULT TRUE")
                 
-                # Add low stock threshold column to items table
-                cursor.execute("SHOW COLUMNS FROM items LIKE 'low_stock_threshold'")
-                if not cursor.fetchone():
-                    cursor.execute("ALTER TABLE items ADD COLUMN low_stock_threshold INT DEFAULT 10")
+                # Serves the POS item grid (active items ordered by category, name) from the index
+                try:
+                    cursor.execute("CREATE INDEX idx_items_status_category_name ON items (status, category, name)")
+                except Exception as e:
+                    # Index might already exist, ignore error
+                    pass
+                
+                # Per-item stock history is read newest first
+                try:
+                    cursor.execute("CREATE INDEX idx_stock_transactions_item_created ON stock_transactions (item_id, created_at)")
+                except Exception as e:
+                    # Index might already exist, ignore error
+                    pass
                 
                 # Create stock settings table
                 cursor.execute("""
@@ -373,6 +829,74 @@ def init_database():
                     # Column might already exist, ignore error
                     pass
                 
+                # Add stored sale hour so hour-of-day grouping can be served from an index
+                try:
+                    cursor.execute("""
+                        ALTER TABLE sales
+                        ADD COLUMN sale_hour TINYINT GENERATED ALWAYS AS (HOUR(sale_date)) STORED,
+                        ADD INDEX idx_sales_hour_date (sale_hour, sale_date)
+                    """)
+                    print("Added sale_hour column to sales table")
+                except pymysql.err.MySQLError as e:
+                    # Already present from an earlier run; anything else breaks the peak-hour analytics
+                    if e.args[0] != DUPLICATE_COLUMN_ERROR:
+                        app.logger.exception("Could not add sale_hour column to sales: %s", e)
+                
+                # Composite index covering the date/status/employee filters used by analytics
+                try:
+                    cursor.execute("CREATE INDEX idx_sales_date_status_emp ON sales (sale_date, status, employee_id, total_amount)")
+                except Exception as e:
+                    # Index might already exist, ignore error
+                    pass
+                
+                # Add stored numeric receipt number so the next number is a single index probe;
+                # non-numeric (POS-prefixed) receipts get NULL and are ignored by MAX()
+                try:
+                    cursor.execute("""
+                        ALTER TABLE sales
+                        ADD COLUMN receipt_seq INT UNSIGNED GENERATED ALWAYS AS (
+                            IF(receipt_number REGEXP '^[0-9]+$', CAST(receipt_number AS UNSIGNED), NULL)
+                        ) STORED,
+                        ADD INDEX idx_receipt_seq (receipt_seq)
+                    """)
+                    print("Added receipt_seq column to sales table")
+                except pymysql.err.MySQLError as e:
+                    # Already present from an earlier run; anything else breaks receipt numbering
+                    if e.args[0] != DUPLICATE_COLUMN_ERROR:
+                        app.logger.exception("Could not add receipt_seq column to sales: %s", e)
+                
+                # Single-row counter handing out receipt numbers, seeded from existing sales
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS receipt_sequence (
+                        id TINYINT PRIMARY KEY,
+                        last_issued INT UNSIGNED NOT NULL
+                    )
+                """)
+                cursor.execute("""
+                    INSERT IGNORE INTO receipt_sequence (id, last_issued)
+                    SELECT 1, COALESCE(MAX(receipt_seq), 1000) FROM sales
+                """)
+                
+                # Add stored receipt sort key so the receipts listing can be ordered from an index
+                try:
+                    cursor.execute("""
+                        ALTER TABLE sales
+                        ADD COLUMN status_sort TINYINT GENERATED ALWAYS AS (
+                            CASE status
+                                WHEN 'pending' THEN 1
+                                WHEN 'cancelled' THEN 2
+                                WHEN 'confirmed' THEN 3
+                                ELSE 4
+                            END
+                        ) STORED,
+                        ADD INDEX idx_status_sort_created (status_sort, created_at DESC)
+                    """)
+                    print("Added status_sort column to sales table")
+                except pymysql.err.MySQLError as e:
+                    # Already present from an earlier run; anything else breaks the receipts listing
+                    if e.args[0] != DUPLICATE_COLUMN_ERROR:
+                        app.logger.exception("Could not add status_sort column to sales: %s", e)
+                
                 # Create sales_items table for tracking individual items in each sale
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS sales_items (
@@ -389,6 +913,13 @@ def init_database():
                     )
                 """)
                 
+                # Covering index so quantity sums per sale are read from the index alone
+                try:
+                    cursor.execute("CREATE INDEX idx_sales_items_sale_qty ON sales_items (sale_id, quantity)")
+                except Exception as e:
+                    # Index might already exist, ignore error
+                    pass
+                
                 # Create hotel_settings table for storing hotel information
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS hotel_settings (
@@ -411,76 +942,16 @@ def init_database():
                     )
                 """)
                 
-                # Add business_type column if it doesn't exist (migration)
-                try:
-                    cursor.execute("ALTER TABLE hotel_settings ADD COLUMN business_type VARCHAR(100) AFTER hotel_address")
-                    print("Added business_type column to hotel_settings table")
-                except Exception as e:
-                    # Column might already exist, ignore error
-                    pass
-                
-                # Add printing settings columns if they don't exist (migration)
-                try:
-                    cursor.execute("ALTER TABLE hotel_settings ADD COLUMN double_print BOOLEAN DEFAULT FALSE")
-                    print("Added double_print column to hotel_settings table")
-                except Exception as e:
-                    # Column might already exist, ignore error
-                    pass
-                
-                try:
-                    cursor.execute("ALTER TABLE hotel_settings ADD COLUMN show_till BOOLEAN DEFAULT TRUE")
-                    print("Added show_till column to hotel_settings table")
-                except Exception as e:
-                    # Column might already exist, ignore error
-                    pass
-                
-                try:
-                    cursor.execute("ALTER TABLE hotel_settings ADD COLUMN include_tax BOOLEAN DEFAULT TRUE")
-                    print("Added include_tax column to hotel_settings table")
-                except Exception as e:
-                    # Column might already exist, ignore error
-                    pass
-                
-                try:
-                    cursor.execute("ALTER TABLE hotel_settings ADD COLUMN show_images BOOLEAN DEFAULT TRUE")
-                    print("Added show_images column to hotel_settings table")
-                except Exception as e:
-                    # Column might already exist, ignore error
-                    pass
-                
-                # Add receipt settings columns if they don't exist (migration)
-                receipt_columns = [
-                    ("receipt_width", "VARCHAR(20) DEFAULT '58mm'"),
-                    ("receipt_font_size", "VARCHAR(20) DEFAULT 'medium'"),
-                    ("receipt_bold_headers", "BOOLEAN DEFAULT TRUE"),
-                    ("receipt_number_format", "VARCHAR(20) DEFAULT 'sequential'"),
-                    ("receipt_number_prefix", "VARCHAR(10) DEFAULT 'POS'"),
-                    ("receipt_starting_number", "INT DEFAULT 1001"),
-                    ("receipt_header_title", "VARCHAR(255)"),
-                    ("receipt_header_subtitle", "VARCHAR(255)"),
-                    ("receipt_header_message", "TEXT"),
-                    ("receipt_show_logo", "BOOLEAN DEFAULT FALSE"),
-                    ("receipt_show_address", "BOOLEAN DEFAULT TRUE"),
-                    ("receipt_show_contact", "BOOLEAN DEFAULT TRUE"),
-                    ("receipt_footer_message", "TEXT"),
-                    ("receipt_show_datetime", "BOOLEAN DEFAULT TRUE"),
-                    ("receipt_show_cashier", "BOOLEAN DEFAULT TRUE"),
-                    ("receipt_show_payment", "BOOLEAN DEFAULT TRUE"),
-                    ("receipt_show_qr", "BOOLEAN DEFAULT FALSE"),
-                    ("enable_receipt_status_update", "BOOLEAN DEFAULT TRUE"),
-                    ("receipt_address", "TEXT"),
-                    ("receipt_phone", "VARCHAR(50)"),
-                    ("receipt_email", "VARCHAR(255)"),
-                    ("receipt_logo_url", "VARCHAR(500)")
-                ]
-                
-                for column_name, column_definition in receipt_columns:
-                    try:
-                        cursor.execute(f"ALTER TABLE hotel_settings ADD COLUMN {column_name} {column_definition}")
-                        print(f"Added {column_name} column to hotel_settings table")
-                    except Exception as e:
-                        # Column might already exist, ignore error
-                        pass
+                # Add missing hotel_settings columns (migration)
+                hotel_settings_columns = get_table_columns(cursor, 'hotel_settings')
+                for column_name, column_definition in HOTEL_SETTINGS_MIGRATION_COLUMNS:
+                    if column_name not in hotel_settings_columns:
+                        # One failed column must not stop the rest of the setup below
+                        try:
+                            cursor.execute(f"ALTER TABLE hotel_settings ADD COLUMN {column_name} {column_definition}")
+                            print(f"Added {column_name} column to hotel_settings table")
+                        except pymysql.err.MySQLError as e:
+                            app.logger.exception("Could not add %s column to hotel_settings: %s", column_name, e)
                 
                 # Create test admin user if it doesn't exist
                 cursor.execute("SELECT COUNT(*) FROM employees WHERE employee_code = '0001'")
@@ -523,7 +994,6 @@ def init_database():
                     admin_id = cursor.fetchone()[0]
                     
                     # Create sample sales for today
-                    from datetime import datetime, timedelta, timedelta
                     today = datetime.now()
                     
                     sample_sales = [
@@ -657,96 +1127,349 @@ def init_database():
                     )
                 """)
                 
+                # Create hourly sales rollup used by the manager dashboard aggregates.
+                # It is kept in step with sales/sales_items by the triggers below.
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS sales_rollup_hourly (
+                        hour_ts DATETIME NOT NULL,
+                        employee_id INT NOT NULL,
+                        status VARCHAR(20) NOT NULL DEFAULT '',
+                        tx_count INT NOT NULL DEFAULT 0,
+                        qty INT NOT NULL DEFAULT 0,
+                        revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+                        PRIMARY KEY (hour_ts, employee_id, status)
+                    )
+                """)
+                
+                sales_rollup_triggers = {
+                    'trg_sales_rollup_insert': """
+                    CREATE TRIGGER trg_sales_rollup_insert AFTER INSERT ON sales
+                    FOR EACH ROW
+                        INSERT INTO sales_rollup_hourly (hour_ts, employee_id, status, tx_count, qty, revenue)
+                        VALUES (DATE_FORMAT(NEW.sale_date, '%Y-%m-%d %H:00:00'), NEW.employee_id, COALESCE(NEW.status, ''), 1, 0, 0)
+                        ON DUPLICATE KEY UPDATE tx_count = tx_count + 1
+                    """,
+                    'trg_sales_rollup_update': """
+                    CREATE TRIGGER trg_sales_rollup_update AFTER UPDATE ON sales
+                    FOR EACH ROW
+                    BEGIN
+                        DECLARE sale_qty INT DEFAULT 0;
+                        DECLARE sale_revenue DECIMAL(12,2) DEFAULT 0;
+                        IF NOT (NEW.sale_date <=> OLD.sale_date AND NEW.employee_id <=> OLD.employee_id AND NEW.status <=> OLD.status) THEN
+                            SELECT COALESCE(SUM(quantity), 0), COALESCE(SUM(total_price), 0)
+                            INTO sale_qty, sale_revenue
+                            FROM sales_items WHERE sale_id = NEW.id;
+                            UPDATE sales_rollup_hourly
+                            SET tx_count = tx_count - 1, qty = qty - sale_qty, revenue = revenue - sale_revenue
+                            WHERE hour_ts = DATE_FORMAT(OLD.sale_date, '%Y-%m-%d %H:00:00')
+                              AND employee_id = OLD.employee_id AND status = COALESCE(OLD.status, '');
+                            INSERT INTO sales_rollup_hourly (hour_ts, employee_id, status, tx_count, qty, revenue)
+                            VALUES (DATE_FORMAT(NEW.sale_date, '%Y-%m-%d %H:00:00'), NEW.employee_id, COALESCE(NEW.status, ''), 1, sale_qty, sale_revenue)
+                            ON DUPLICATE KEY UPDATE tx_count = tx_count + 1, qty = qty + sale_qty, revenue = revenue + sale_revenue;
+                        END IF;
+                    END
+                    """,
+                    'trg_sales_rollup_delete': """
+                    CREATE TRIGGER trg_sales_rollup_delete BEFORE DELETE ON sales
+                    FOR EACH ROW
+                    BEGIN
+                        DECLARE sale_qty INT DEFAULT 0;
+                        DECLARE sale_revenue DECIMAL(12,2) DEFAULT 0;
+                        SELECT COALESCE(SUM(quantity), 0), COALESCE(SUM(total_price), 0)
+                        INTO sale_qty, sale_revenue
+                        FROM sales_items WHERE sale_id = OLD.id;
+                        UPDATE sales_rollup_hourly
+                        SET tx_count = tx_count - 1, qty = qty - sale_qty, revenue = revenue - sale_revenue
+                        WHERE hour_ts = DATE_FORMAT(OLD.sale_date, '%Y-%m-%d %H:00:00')
+                          AND employee_id = OLD.employee_id AND status = COALESCE(OLD.status, '');
+                    END
+                    """,
+                    'trg_sales_items_rollup_insert': """
+                    CREATE TRIGGER trg_sales_items_rollup_insert AFTER INSERT ON sales_items
+                    FOR EACH ROW
+                        INSERT INTO sales_rollup_hourly (hour_ts, employee_id, status, tx_count, qty, revenue)
+                        SELECT DATE_FORMAT(s.sale_date, '%Y-%m-%d %H:00:00'), s.employee_id, COALESCE(s.status, ''), 0, NEW.quantity, NEW.total_price
+                        FROM sales s WHERE s.id = NEW.sale_id
+                        ON DUPLICATE KEY UPDATE qty = qty + NEW.quantity, revenue = revenue + NEW.total_price
+                    """,
+                    'trg_sales_items_rollup_delete': """
+                    CREATE TRIGGER trg_sales_items_rollup_delete AFTER DELETE ON sales_items
+                    FOR EACH ROW
+                        UPDATE sales_rollup_hourly r
+                        JOIN sales s ON s.id = OLD.sale_id
+                        SET r.qty = r.qty - OLD.quantity, r.revenue = r.revenue - OLD.total_price
+                        WHERE r.hour_ts = DATE_FORMAT(s.sale_date, '%Y-%m-%d %H:00:00')
+                          AND r.employee_id = s.employee_id AND r.status = COALESCE(s.status, '')
+                    """
+                }
+                rollup_ready, rollup_created = install_triggers(cursor, sales_rollup_triggers)
+                
+                # (Re)build the rollup from existing sales once its triggers are in place,
+                # so sales recorded while they were missing are counted too
+                cursor.execute("SELECT COUNT(*) FROM sales_rollup_hourly")
+                rollup_empty = cursor.fetchone()[0] == 0
+                if rollup_ready and (rollup_created or rollup_empty):
+                    connection.begin()
+                    cursor.execute("DELETE FROM sales_rollup_hourly")
+                    cursor.execute("""
+                        INSERT INTO sales_rollup_hourly (hour_ts, employee_id, status, tx_count, qty, revenue)
+                        SELECT 
+                            DATE_FORMAT(s.sale_date, '%Y-%m-%d %H:00:00'),
+                            s.employee_id,
+                            COALESCE(s.status, ''),
+                            COUNT(*),
+                            COALESCE(SUM(si.qty), 0),
+                            COALESCE(SUM(si.revenue), 0)
+                        FROM sales s
+                        LEFT JOIN (
+                            SELECT sale_id, SUM(quantity) as qty, SUM(total_price) as revenue
+                            FROM sales_items
+                            GROUP BY sale_id
+                        ) si ON s.id = si.sale_id
+                        GROUP BY DATE_FORMAT(s.sale_date, '%Y-%m-%d %H:00:00'), s.employee_id, COALESCE(s.status, '')
+                    """)
+                    connection.commit()
+                    print("Sales rollup backfilled")
+                elif not rollup_ready:
+                    print("Sales rollup triggers missing; the manager dashboard will read the sales tables directly")
+                
+                # Create per-employee daily sales summary used by employee analytics
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS employee_day_sales (
+                        employee_id INT NOT NULL,
+                        sale_day DATE NOT NULL,
+                        status VARCHAR(20) NOT NULL DEFAULT '',
+                        tx_count INT NOT NULL DEFAULT 0,
+                        revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+                        PRIMARY KEY (employee_id, sale_day, status),
+                        INDEX idx_employee_day_sales_day (sale_day)
+                    )
+                """)
+                
+                employee_day_sales_triggers = {
+                    'trg_employee_day_sales_insert': """
+                    CREATE TRIGGER trg_employee_day_sales_insert AFTER INSERT ON sales
+                    FOR EACH ROW
+                        INSERT INTO employee_day_sales (employee_id, sale_day, status, tx_count, revenue)
+                        VALUES (NEW.employee_id, DATE(NEW.sale_date), COALESCE(NEW.status, ''), 1, NEW.total_amount)
+                        ON DUPLICATE KEY UPDATE tx_count = tx_count + 1, revenue = revenue + NEW.total_amount
+                    """,
+                    'trg_employee_day_sales_update': """
+                    CREATE TRIGGER trg_employee_day_sales_update AFTER UPDATE ON sales
+                    FOR EACH ROW
+                    BEGIN
+                        IF NOT (NEW.sale_date <=> OLD.sale_date AND NEW.employee_id <=> OLD.employee_id
+                                AND NEW.status <=> OLD.status AND NEW.total_amount <=> OLD.total_amount) THEN
+                            UPDATE employee_day_sales
+                            SET tx_count = tx_count - 1, revenue = revenue - OLD.total_amount
+                            WHERE employee_id = OLD.employee_id AND sale_day = DATE(OLD.sale_date)
+                              AND status = COALESCE(OLD.status, '');
+                            INSERT INTO employee_day_sales (employee_id, sale_day, status, tx_count, revenue)
+                            VALUES (NEW.employee_id, DATE(NEW.sale_date), COALESCE(NEW.status, ''), 1, NEW.total_amount)
+                            ON DUPLICATE KEY UPDATE tx_count = tx_count + 1, revenue = revenue + NEW.total_amount;
+                        END IF;
+                    END
+                    """,
+                    'trg_employee_day_sales_delete': """
+                    CREATE TRIGGER trg_employee_day_sales_delete AFTER DELETE ON sales
+                    FOR EACH ROW
+                        UPDATE employee_day_sales
+                        SET tx_count = tx_count - 1, revenue = revenue - OLD.total_amount
+                        WHERE employee_id = OLD.employee_id AND sale_day = DATE(OLD.sale_date)
+                          AND status = COALESCE(OLD.status, '')
+                    """
+                }
+                employee_day_ready, employee_day_created = install_triggers(cursor, employee_day_sales_triggers)
+                
+                # (Re)build the summary once its triggers are in place (see the rollup above)
+                cursor.execute("SELECT COUNT(*) FROM employee_day_sales")
+                employee_day_empty = cursor.fetchone()[0] == 0
+                if employee_day_ready and (employee_day_created or employee_day_empty):
+                    connection.begin()
+                    cursor.execute("DELETE FROM employee_day_sales")
+                    cursor.execute("""
+                        INSERT INTO employee_day_sales (employee_id, sale_day, status, tx_count, revenue)
+                        SELECT employee_id, DATE(sale_date), COALESCE(status, ''), COUNT(*), COALESCE(SUM(total_amount), 0)
+                        FROM sales
+                        GROUP BY employee_id, DATE(sale_date), COALESCE(status, '')
+                    """)
+                    connection.commit()
+                    print("Employee daily sales summary backfilled")
+                elif not employee_day_ready:
+                    print("Employee daily sales triggers missing; employee analytics will read the sales table directly")
+                
+                # Keep a per-sale line count on sales so receipt listings don't need to join sales_items
+                item_count_added = False
+                item_count_column = True
+                try:
+                    cursor.execute("ALTER TABLE sales ADD COLUMN item_count INT NOT NULL DEFAULT 0")
+                    item_count_added = True
+                    print("Added item_count column to sales table")
+                except pymysql.err.MySQLError as e:
+                    if e.args[0] != DUPLICATE_COLUMN_ERROR:
+                        item_count_column = False
+                        app.logger.error("Could not add item_count column to sales: %s", e)
+                
+                # Without the column the triggers are left out, so receipt listings count lines instead
+                if item_count_column:
+                    item_count_triggers = {
+                        'trg_sales_items_count_insert': """
+                        CREATE TRIGGER trg_sales_items_count_insert AFTER INSERT ON sales_items
+                        FOR EACH ROW
+                            UPDATE sales SET item_count = item_count + 1 WHERE id = NEW.sale_id
+                        """,
+                        'trg_sales_items_count_delete': """
+                        CREATE TRIGGER trg_sales_items_count_delete AFTER DELETE ON sales_items
+                        FOR EACH ROW
+                            UPDATE sales SET item_count = item_count - 1 WHERE id = OLD.sale_id
+                        """
+                    }
+                    item_count_ready, item_count_created = install_triggers(cursor, item_count_triggers)
+                    
+                    # Recount once the triggers are in place, covering sales saved while they were missing
+                    if item_count_ready and (item_count_added or item_count_created):
+                        cursor.execute("""
+                            UPDATE sales s
+                            LEFT JOIN (SELECT sale_id, COUNT(*) as line_count FROM sales_items GROUP BY sale_id) si
+                              ON s.id = si.sale_id
+                            SET s.item_count = COALESCE(si.line_count, 0)
+                        """)
+                        print("Sales item counts backfilled")
+                    elif not item_count_ready:
+                        print("Sales item count triggers missing; receipt listings will count sale lines directly")
+                
                 connection.commit()
                 print("Database tables initialized successfully")
         except Exception as e:
             print(f"Database initialization error: {e}")
         finally:
+            # The lock belongs to the session, which outlives close() in the pool
+            if init_lock_acquired:
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute("SELECT RELEASE_LOCK('hotel_pos_init_database')")
+                except Exception as e:
+                    print(f"Error releasing database initialization lock: {e}")
             connection.close()
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return filename.lower().endswith(ALLOWED_SUFFIXES)
+
+# Argon2id parameters (RFC 9106 low-memory profile); verifying takes tens of
+# milliseconds rather than the hundreds PBKDF2 needs for similar strength
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
 
-def verify_password(stored_password, provided_password):
-    """Verify a password against its hash"""
-    return stored_password == provided_password
+def is_legacy_password_hash(password_hash):
+    """Unsalted SHA-256 hex digests from before salted hashing carry no method prefix"""
+    return '$' not in password_hash
+
+def password_needs_rehash(password_hash):
+    """True for hashes not made with the current Argon2 parameters"""
+    if not password_hash.startswith('$argon2'):
+        return True
+    return password_hasher.check_needs_rehash(password_hash)
+
+def verify_password(password, password_hash):
+    """Verify a password against its stored hash in constant time"""
+    if not password or not password_hash:
+        return False
+    if is_legacy_password_hash(password_hash):
+        return hmac.compare_digest(password_hash, hashlib.sha256(password.encode()).hexdigest())
+    if password_hash.startswith('$argon2'):
+        try:
+            return password_hasher.verify(password_hash, password)
+        except (VerifyMismatchError, InvalidHashError):
+            return False
+    # PBKDF2 hashes written by werkzeug before the switch to Argon2
+    return check_password_hash(password_hash, password)
 
 def hash_password(password):
-    """Hash password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash password with salted Argon2id"""
+    return password_hasher.hash(password)
+
+ROLE_DASHBOARD_URLS = {
+    'admin': '/admin/dashboard',
+    'manager': '/manager/dashboard',
+    'cashier': '/cashier/dashboard',
+    'butchery': '/butchery/dashboard',
+    'employee': '/employee/dashboard'
+}
 
 def get_role_dashboard_url(role):
     """Get the appropriate dashboard URL based on employee role"""
-    role_urls = {
-        'admin': '/admin/dashboard',
-        'manager': '/manager/dashboard',
-        'cashier': '/cashier/dashboard',
-        'butchery': '/butchery/dashboard',
-        'employee': '/employee/dashboard'
-    }
-    return role_urls.get(role, '/employee/dashboard')
+    return ROLE_DASHBOARD_URLS.get(role, '/employee/dashboard')
+
+# The latest hotel_settings row is read on nearly every page render, but it
+# only changes through the settings endpoints, which drop the cached copy
+HOTEL_SETTINGS_CACHE_TTL = 60
+_settings_cache = {'row': None, 'ts': float('-inf'), 'generation': 0}
+
+HOTEL_SETTINGS_QUERY = """
+    SELECT hotel_name, company_email, company_phone, hotel_address, business_type,
+           payment_method, till_number, business_number, account_number
+    FROM hotel_settings
+    ORDER BY id DESC
+    LIMIT 1
+"""
+
+DEFAULT_HOTEL_SETTINGS = {
+    'hotel_name': 'Hotel POS',
+    'company_email': '',
+    'company_phone': '',
+    'hotel_address': '',
+    'business_type': '',
+    'payment_method': 'buy_goods',
+    'till_number': '',
+    'business_number': '',
+    'account_number': ''
+}
+
+def fetch_hotel_settings_row():
+    """Get the latest hotel_settings row as a dict, reusing a recent copy when available.
+
+    The row is shared with other requests, so callers must copy it before changing it.
+    """
+    if time.monotonic() - _settings_cache['ts'] < HOTEL_SETTINGS_CACHE_TTL:
+        return _settings_cache['row']
+    
+    generation = _settings_cache['generation']
+    connection = get_db_connection()
+    if not connection:
+        raise RuntimeError('Database connection failed')
+    try:
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(HOTEL_SETTINGS_QUERY)
+            settings = cursor.fetchone()
+    finally:
+        connection.close()
+    
+    # Don't cache a row read while a settings write was being committed
+    if generation == _settings_cache['generation']:
+        _settings_cache['row'] = settings
+        _settings_cache['ts'] = time.monotonic()
+    return settings
+
+def invalidate_hotel_settings_cache():
+    """Drop the cached hotel_settings row after the table has been written"""
+    _settings_cache['generation'] += 1
+    _settings_cache['ts'] = float('-inf')
 
 def get_hotel_settings():
     """Get hotel settings from database"""
     try:
-        connection = get_db_connection()
-        if not connection:
-            return {
-                'hotel_name': 'Hotel POS',
-                'company_email': '',
-                'company_phone': '',
-                'hotel_address': '',
-                'payment_method': 'buy_goods',
-                'till_number': '',
-                'business_number': '',
-                'account_number': ''
-            }
-        
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT * FROM hotel_settings ORDER BY id DESC LIMIT 1")
-            settings = cursor.fetchone()
-            
-            if settings:
-                return {
-                    'hotel_name': settings[1],
-                    'company_email': settings[2],
-                    'company_phone': settings[3],
-                    'hotel_address': settings[4],
-                    'business_type': settings[5] if len(settings) > 5 else '',
-                    'payment_method': settings[6] if len(settings) > 6 else 'buy_goods',
-                    'till_number': settings[7] if len(settings) > 7 else '',
-                    'business_number': settings[8] if len(settings) > 8 else '',
-                    'account_number': settings[9] if len(settings) > 9 else ''
-                }
-            else:
-                return {
-                    'hotel_name': 'Hotel POS',
-                    'company_email': '',
-                    'company_phone': '',
-                    'hotel_address': '',
-                    'business_type': '',
-                    'payment_method': 'buy_goods',
-                    'till_number': '',
-                    'business_number': '',
-                    'account_number': ''
-                }
+        settings = fetch_hotel_settings_row()
+        return dict(settings) if settings else dict(DEFAULT_HOTEL_SETTINGS)
     except Exception as e:
-        print(f"Error fetching hotel settings: {e}")
-        return {
-            'hotel_name': 'Hotel POS',
-            'company_email': '',
-            'company_phone': '',
-            'hotel_address': '',
-            'business_type': '',
-            'payment_method': 'buy_goods',
-            'till_number': '',
-            'business_number': '',
-            'account_number': ''
-        }
-    finally:
-        if 'connection' in locals():
-            connection.close()
+        app.logger.exception("Error fetching hotel settings: %s", e)
+        return dict(DEFAULT_HOTEL_SETTINGS)
+
+@app.context_processor
+def inject_hotel_settings():
+    """Expose hotel settings to every template, loading them at most once per request"""
+    if 'hotel_settings' not in g:
+        g.hotel_settings = get_hotel_settings()
+    return {'hotel_settings': g.hotel_settings}
 
 def get_employee_profile_photo(employee_id):
     """Get employee profile photo from database"""
@@ -767,12 +1490,38 @@ def get_employee_profile_photo(employee_id):
         return None
     finally:
         connection.close()
+
+def require_role(*roles):
+    """Redirect to the landing page unless the logged-in employee has one of the given roles"""
+    allowed = frozenset(roles)
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if 'employee_id' not in session or session.get('employee_role') not in allowed:
+                return redirect(url_for('index'))
+            # Cache the verified role for the rest of the request
+            g.employee_role = session['employee_role']
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def require_api_role(*roles):
+    """Answer 401 JSON unless the logged-in employee has one of the given roles"""
+    allowed = frozenset(roles)
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if 'employee_id' not in session or session.get('employee_role') not in allowed:
+                return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+            g.employee_role = session['employee_role']
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
 @app.route('/api/admin/cash-drawer/session/<int:session_id>/logs', methods=['GET'])
+@require_api_role('admin', 'manager')
 def admin_session_logs(session_id: int):
     """Return audit logs that happened within a session window for that cashier."""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
@@ -850,14 +1599,12 @@ def dashboard():
 @app.route('/pos')
 def point_of_sale():
     """Point of Sale page"""
-    hotel_settings = get_hotel_settings()
     employee_id = session.get('employee_id')
     employee_role = session.get('employee_role', 'guest')
     employee_name = session.get('employee_name', 'Guest')
     employee_profile_photo = get_employee_profile_photo(employee_id)
     
     return render_template('pos.html', 
-                         hotel_settings=hotel_settings,
                          employee_id=employee_id,
                          employee_role=employee_role,
                          employee_name=employee_name,
@@ -874,91 +1621,77 @@ def admin_dashboard():
         session['employee_role'] = 'admin'
         session['employee_code'] = '0001'
     
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('dashboards/admin_dashboard.html', 
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/manager/dashboard')
 def manager_dashboard():
     """Manager dashboard"""
     if 'employee_id' not in session or session.get('employee_role') != 'manager':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('dashboards/manager_dashboard.html', 
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/manager/human-resources')
 def manager_human_resources():
     """Manager human resources management"""
     if 'employee_id' not in session or session.get('employee_role') != 'manager':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('manager/human_resources.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/manager/item-management')
 def manager_item_management():
     """Manager item management"""
     if 'employee_id' not in session or session.get('employee_role') != 'manager':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('manager/item_management.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/manager/analytics')
 def manager_analytics():
     """Manager analytics and reports"""
     if 'employee_id' not in session or session.get('employee_role') != 'manager':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('manager/analytics.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/manager/settings')
 def manager_settings():
     """Manager system settings"""
     if 'employee_id' not in session or session.get('employee_role') != 'manager':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('manager/settings.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/manager/off-days-management')
 def manager_off_days_management():
     """Manager off days management"""
     if 'employee_id' not in session or session.get('employee_role') != 'manager':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('manager/off_days_management.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 
 @app.route('/cashier/dashboard')
@@ -966,39 +1699,33 @@ def cashier_dashboard():
     """Cashier dashboard"""
     if 'employee_id' not in session or session.get('employee_role') != 'cashier':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('dashboards/cashier_dashboard.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/cashier/cash-drawer')
 def cashier_cash_drawer():
     """Cashier cash drawer management"""
     if 'employee_id' not in session or session.get('employee_role') != 'cashier':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('cashier/cash_drawer.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/cashier/stock-management')
 def cashier_stock_management():
     """Cashier stock management"""
     if 'employee_id' not in session or session.get('employee_role') != 'cashier':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('cashier/stock_management.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/stock-audits')
 def stock_audits():
@@ -1010,13 +1737,11 @@ def stock_audits():
     if employee_role not in ['admin', 'manager', 'cashier']:
         return redirect(url_for('index'))
     
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('stock_audits.html',
                          employee_name=session.get('employee_name'),
                          employee_role=employee_role,
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/api/cashier/stock-data', methods=['GET'])
 def get_cashier_stock_data():
@@ -1432,6 +2157,7 @@ def cashier_stock_in():
             ))
             
             connection.commit()
+            invalidate_pos_items_cache()
             
             return jsonify({
                 'success': True, 
@@ -1452,26 +2178,22 @@ def cashier_receipt_confirmation():
     """Cashier receipt confirmation"""
     if 'employee_id' not in session or session.get('employee_role') != 'cashier':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('cashier/receipt_confirmation.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/cashier/payments')
 def cashier_payments():
     """Cashier payments page showing all employees and their sales"""
     if 'employee_id' not in session or session.get('employee_role') != 'cashier':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('cashier/payments.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 @app.route('/api/cashier/employee-sales', methods=['GET'])
 def get_employee_sales_data():
     """Get employee sales data for payments page"""
@@ -1494,7 +2216,6 @@ def get_employee_sales_data():
     if filter_type == 'day' and selected_date:
         try:
             # Validate date format
-            from datetime import datetime
             datetime.strptime(selected_date, '%Y-%m-%d')
             # Use validated date in query (safe after validation)
             date_filter = f"AND DATE(s.sale_date) = '{selected_date}'"
@@ -1506,7 +2227,6 @@ def get_employee_sales_data():
     elif filter_type == 'month' and selected_date:
         try:
             # Validate date format and extract year-month
-            from datetime import datetime
             date_obj = datetime.strptime(selected_date, '%Y-%m-%d')
             year = date_obj.year
             month = date_obj.month
@@ -1690,7 +2410,6 @@ def get_employee_sales_data():
                 week_revenue = today_revenue
             elif filter_type == 'month' and selected_date:
                 try:
-                    from datetime import datetime
                     date_obj = datetime.strptime(selected_date, '%Y-%m-%d')
                     year = date_obj.year
                     month = date_obj.month
@@ -2938,31 +3657,35 @@ def butchery_dashboard():
     """Butchery dashboard"""
     if 'employee_id' not in session or session.get('employee_role') != 'butchery':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('dashboards/butchery_dashboard.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/employee/dashboard')
 def employee_dashboard():
     """Employee dashboard"""
     if 'employee_id' not in session or session.get('employee_role') not in ['employee', 'admin', 'manager']:
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('dashboards/employee_dashboard.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
+
+# Health checks are polled several times a second, so the timestamp string is
+# formatted at most once per second
+_health_timestamp = {'second': None, 'text': ''}
 
 @app.route('/api/health')
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
+    second = int(time.time())
+    if second != _health_timestamp['second']:
+        _health_timestamp['text'] = datetime.fromtimestamp(second).isoformat()
+        _health_timestamp['second'] = second
+    return jsonify({'status': 'healthy', 'timestamp': _health_timestamp['text']})
 
 @app.route('/test-permissions-settings')
 def test_permissions_settings():
@@ -3048,14 +3771,20 @@ def employee_login():
     try:
         with connection.cursor(pymysql.cursors.DictCursor) as cursor:
             cursor.execute("""
-                SELECT id, full_name, email, role, status, profile_photo 
+                SELECT id, full_name, email, role, status, profile_photo, password_hash 
                 FROM employees 
-                WHERE employee_code = %s AND password_hash = %s
-            """, (employee_code, hash_password(password)))
+                WHERE employee_code = %s
+            """, (employee_code,))
             
             employee = cursor.fetchone()
             
-            if employee:
+            if employee and verify_password(password, employee['password_hash']):
+                # Upgrade older hashes now that we have the plain password
+                if password_needs_rehash(employee['password_hash']):
+                    cursor.execute("UPDATE employees SET password_hash = %s WHERE id = %s",
+                                   (hash_password(password), employee['id']))
+                    connection.commit()
+                
                 if employee['status'] == 'suspended':
                     return jsonify({'success': False, 'message': 'Your account has been suspended. Please contact your administrator.'}), 403
                 elif employee['status'] == 'waiting_approval':
@@ -3086,7 +3815,7 @@ def employee_login():
                 return jsonify({'success': False, 'message': 'Invalid employee code or password'}), 401
                 
     except Exception as e:
-        print(f"Login error: {e}")
+        app.logger.exception("Login error: %s", e)
         return jsonify({'success': False, 'message': 'An error occurred during login'}), 500
     finally:
         connection.close()
@@ -3125,14 +3854,16 @@ def employee_register():
     
     try:
         with connection.cursor() as cursor:
-            # Check if employee code already exists
-            cursor.execute("SELECT id FROM employees WHERE employee_code = %s", (employee_code,))
-            if cursor.fetchone():
+            # Check if employee code or email already exists
+            cursor.execute("""
+                SELECT employee_code, email FROM employees
+                WHERE employee_code = %s OR email = %s
+                LIMIT 2
+            """, (employee_code, data.get('email')))
+            existing = cursor.fetchall()
+            if any(row[0] == employee_code for row in existing):
                 return jsonify({'success': False, 'message': 'Employee code already exists'}), 400
-            
-            # Check if email already exists
-            cursor.execute("SELECT id FROM employees WHERE email = %s", (data.get('email'),))
-            if cursor.fetchone():
+            if existing:
                 return jsonify({'success': False, 'message': 'Email already exists'}), 400
             
             # Insert new employee
@@ -3152,7 +3883,7 @@ def employee_register():
             return jsonify({'success': True, 'message': 'Registration successful! Your account is waiting for approval.'})
             
     except Exception as e:
-        print(f"Registration error: {e}")
+        app.logger.exception("Registration error: %s", e)
         return jsonify({'success': False, 'message': 'An error occurred during registration'}), 500
     finally:
         connection.close()
@@ -3204,11 +3935,31 @@ def validate_employee():
                 return jsonify({'success': False, 'message': 'Invalid employee code'}), 404
                 
     except Exception as e:
-        print(f"Error validating employee: {e}")
+        app.logger.exception("Error validating employee: %s", e)
         return jsonify({'success': False, 'message': 'Error validating employee'}), 500
     finally:
         connection.close()
 
+def reserve_receipt_number(cursor):
+    """Hand out the next receipt number (1001 upwards) atomically.
+
+    LAST_INSERT_ID(expr) makes the incremented value come back as the
+    statement's insert id, so two tills can never be given the same number.
+    GREATEST() keeps the counter ahead of numbers saved by any other path.
+    """
+    cursor.execute("""
+        UPDATE receipt_sequence 
+        SET last_issued = LAST_INSERT_ID(
+            GREATEST(last_issued, (SELECT COALESCE(MAX(receipt_seq), 1000) FROM sales)) + 1
+        )
+        WHERE id = 1
+    """)
+    if cursor.rowcount:
+        return cursor.lastrowid
+    # Counter not seeded yet (init_database has not run): fall back to the sales table
+    cursor.execute("SELECT COALESCE(MAX(receipt_seq), 1000) + 1 FROM sales")
+    return cursor.fetchone()[0]
+
 @app.route('/api/receipt/next-number', methods=['GET'])
 def get_next_receipt_number():
     """Get the next receipt number from database"""
@@ -3218,14 +3969,7 @@ def get_next_receipt_number():
     
     try:
         with connection.cursor() as cursor:
-            # Get the highest receipt number from sales table
-            cursor.execute("""
-                SELECT COALESCE(MAX(CAST(receipt_number AS UNSIGNED)), 1000) as max_receipt_number 
-                FROM sales
-            """)
-            
-            result = cursor.fetchone()
-            next_receipt_number = result[0] + 1 if result else 1001
+            next_receipt_number = reserve_receipt_number(cursor)
             
             return jsonify({
                 'success': True,
@@ -3233,7 +3977,7 @@ def get_next_receipt_number():
             })
             
     except Exception as e:
-        print(f"Error getting next receipt number: {e}")
+        app.logger.exception("Error getting next receipt number: %s", e)
         return jsonify({'success': False, 'message': 'Error getting receipt number'}), 500
     finally:
         connection.close()
@@ -3245,78 +3989,61 @@ def admin_role_page_view():
     """Admin role page view"""
     if 'employee_id' not in session or session.get('employee_role') != 'admin':
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('admin/role_page_view.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/admin/human-resources')
+@require_role('admin', 'manager')
 def admin_human_resources():
     """Admin human resources management"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('admin/human_resources.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/admin/payroll')
+@require_role('admin', 'manager')
 def admin_payroll():
     """Admin payroll registration page"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('admin/payroll.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/admin/item-management')
+@require_role('admin', 'manager')
 def admin_item_management():
     """Admin item management"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('admin/item_management.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/admin/analytics')
+@require_role('admin', 'manager')
 def admin_analytics():
     """Admin analytics and reports"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('admin/analytics.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/admin/settings')
+@require_role('admin', 'manager')
 def admin_settings():
     """Admin system settings"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('admin/settings.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/off-days')
 def off_days_view():
@@ -3335,13 +4062,11 @@ def off_days_view():
             return redirect(url_for('employee_off_days'))
     
     # No session - show public view with all employees
-    hotel_settings = get_hotel_settings()
     return render_template('admin/off_days_management.html',
                          employee_name='Guest',
                          employee_role='guest',
                          employee_id=None,
-                         employee_profile_photo=None,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=None)
 
 @app.route('/admin/off-days-management')
 def admin_off_days_management():
@@ -3352,7 +4077,6 @@ def admin_off_days_management():
         # If not authorized, redirect to public off-days page
         return redirect(url_for('off_days_view'))
     
-    hotel_settings = get_hotel_settings()
     employee_id = session.get('employee_id')
     employee_profile_photo = get_employee_profile_photo(employee_id)
     employee_role = session.get('employee_role')
@@ -3361,47 +4085,37 @@ def admin_off_days_management():
                          employee_name=session.get('employee_name'),
                          employee_role=employee_role,
                          employee_id=employee_id,
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/admin/cashiers')
+@require_role('admin', 'manager')
 def admin_cashiers():
     """Admin cashiers management"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('admin/cashiers.html',
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/admin/cashier-transactions')
+@require_role('admin', 'manager')
 def admin_cashier_transactions_page():
     """Admin view - all transactions grouped by session"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('admin/cashier_transactions.html',
                            employee_name=session.get('employee_name'),
                            employee_role=session.get('employee_role'),
-                           employee_profile_photo=employee_profile_photo,
-                           hotel_settings=hotel_settings)
+                           employee_profile_photo=employee_profile_photo)
 
 @app.route('/admin/expenses-incurred')
+@require_role('admin', 'manager')
 def admin_expenses_incurred_page():
     """Admin view - all cash outs and safe drops"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('admin/expenses_incurred.html',
                            employee_name=session.get('employee_name'),
                            employee_role=session.get('employee_role'),
-                           employee_profile_photo=employee_profile_photo,
-                           hotel_settings=hotel_settings)
+                           employee_profile_photo=employee_profile_photo)
 
 @app.route('/api/get-network-info', methods=['GET'])
 def get_network_info():
@@ -4311,14 +5025,12 @@ def employee_off_days():
     """Employee off days viewing page"""
     if 'employee_id' not in session:
         return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('employee/off_days.html',
                          employee_name=session.get('employee_name'),
                          employee_id=session.get('employee_id'),
                          employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/employee/profile-management')
 def employee_profile_management():
@@ -4350,15 +5062,13 @@ def employee_profile_management():
             if employee['updated_at']:
                 employee['updated_at'] = employee['updated_at'].isoformat()
             
-            hotel_settings = get_hotel_settings()
             employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
             
             return render_template('employee/profile_management.html',
                                  employee=employee,
                                  employee_name=session.get('employee_name'),
                                  employee_role=session.get('employee_role'),
-                                 employee_profile_photo=employee_profile_photo,
-                                 hotel_settings=hotel_settings)
+                                 employee_profile_photo=employee_profile_photo)
             
     except Exception as e:
         print(f"Error fetching employee profile: {e}")
@@ -4527,14 +5237,8 @@ def get_all_employees():
                 """)
             employees = cursor.fetchall()
             
-            # Convert datetime objects to strings for JSON serialization
-            for employee in employees:
-                if employee['created_at']:
-                    employee['created_at'] = employee['created_at'].isoformat()
-                if employee['updated_at']:
-                    employee['updated_at'] = employee['updated_at'].isoformat()
-            
-            return jsonify({'success': True, 'employees': employees})
+            # orjson writes created_at/updated_at as ISO 8601 straight from the rows
+            return json_response({'success': True, 'employees': employees})
             
     except Exception as e:
         print(f"Error fetching employees: {e}")
@@ -4543,11 +5247,9 @@ def get_all_employees():
         connection.close()
 
 @app.route('/api/payroll/register', methods=['POST'])
+@require_api_role('admin', 'manager')
 def register_payroll_profile():
     """Create or update payroll profile for an employee"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-
     data = request.get_json() or {}
     required = ['employee_id', 'basic_salary', 'payment_frequency']
     for field in required:
@@ -4629,11 +5331,9 @@ def register_payroll_profile():
         connection.close()
 
 @app.route('/api/hr/employees/<int:employee_id>', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_employee_details(employee_id):
     """Get specific employee details"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
@@ -4651,25 +5351,40 @@ def get_employee_details(employee_id):
             if not employee:
                 return jsonify({'success': False, 'message': 'Employee not found'}), 404
             
-            # Convert datetime objects to strings
-            if employee['created_at']:
-                employee['created_at'] = employee['created_at'].isoformat()
-            if employee['updated_at']:
-                employee['updated_at'] = employee['updated_at'].isoformat()
-            
-            return jsonify({'success': True, 'employee': employee})
+            # orjson writes created_at/updated_at as ISO 8601 straight from the row
+            return json_response({'success': True, 'employee': employee})
             
     except Exception as e:
         print(f"Error fetching employee: {e}")
         return jsonify({'success': False, 'message': 'An error occurred while fetching employee details'}), 500
     finally:
         connection.close()
+def employee_exists(cursor, employee_id):
+    """Tell a missing employee apart from an UPDATE that changed nothing.
+
+    MySQL reports changed rows, not matched rows, so re-saving identical
+    values leaves rowcount at 0; only then is this extra lookup needed.
+    """
+    cursor.execute("SELECT 1 FROM employees WHERE id = %s", (employee_id,))
+    return cursor.fetchone() is not None
+
+# Fields left out of the request are passed as NULL and keep their current value
+UPDATE_EMPLOYEE_QUERY = """
+    UPDATE employees 
+    SET full_name = COALESCE(%s, full_name),
+        email = COALESCE(%s, email),
+        phone_number = COALESCE(%s, phone_number),
+        password_hash = COALESCE(%s, password_hash),
+        role = COALESCE(%s, role),
+        status = COALESCE(%s, status),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = %s
+"""
+
 @app.route('/api/hr/employees/<int:employee_id>', methods=['PUT'])
+@require_api_role('admin', 'manager')
 def update_employee(employee_id):
     """Update employee details"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json()
     if not data:
         return jsonify({'success': False, 'message': 'No data provided'}), 400
@@ -4680,56 +5395,31 @@ def update_employee(employee_id):
     
     try:
         with connection.cursor() as cursor:
-            # Check if employee exists
-            cursor.execute("SELECT id FROM employees WHERE id = %s", (employee_id,))
-            if not cursor.fetchone():
-                return jsonify({'success': False, 'message': 'Employee not found'}), 404
-            
-            # Build update query dynamically
-            update_fields = []
-            update_values = []
-            
-            if 'full_name' in data:
-                update_fields.append("full_name = %s")
-                update_values.append(data['full_name'])
-            
-            if 'email' in data:
-                # Check if email already exists for another employee
-                cursor.execute("SELECT id FROM employees WHERE email = %s AND id != %s", 
-                             (data['email'], employee_id))
-                if cursor.fetchone():
-                    return jsonify({'success': False, 'message': 'Email already exists'}), 400
-                update_fields.append("email = %s")
-                update_values.append(data['email'])
-            
-            if 'phone_number' in data:
-                update_fields.append("phone_number = %s")
-                update_values.append(data['phone_number'])
-            
-            if 'password' in data and data['password']:
-                update_fields.append("password_hash = %s")
-                update_values.append(hash_password(data['password']))
+            # Restrict managers from changing roles to admin
+            if session.get('employee_role') == 'manager' and data.get('role') == 'admin':
+                return jsonify({'success': False, 'message': 'Managers cannot assign admin roles'}), 403
             
-            if 'role' in data:
-                # Restrict managers from changing roles to admin
-                if session.get('employee_role') == 'manager' and data['role'] == 'admin':
-                    return jsonify({'success': False, 'message': 'Managers cannot assign admin roles'}), 403
-                update_fields.append("role = %s")
-                update_values.append(data['role'])
-            
-            if 'status' in data:
-                update_fields.append("status = %s")
-                update_values.append(data['status'])
-            
-            if not update_fields:
+            password = data.get('password')
+            values = (
+                data.get('full_name'),
+                # The unique index on email rejects addresses held by another employee
+                data.get('email'),
+                data.get('phone_number'),
+                hash_password(password) if password else None,
+                data.get('role'),
+                data.get('status'),
+            )
+            if all(value is None for value in values):
                 return jsonify({'success': False, 'message': 'No valid fields to update'}), 400
             
-            # Add updated_at
-            update_fields.append("updated_at = CURRENT_TIMESTAMP")
-            update_values.append(employee_id)
-            
-            query = f"UPDATE employees SET {', '.join(update_fields)} WHERE id = %s"
-            cursor.execute(query, update_values)
+            try:
+                cursor.execute(UPDATE_EMPLOYEE_QUERY, values + (employee_id,))
+            except pymysql.err.IntegrityError as e:
+                if e.args[0] == DUPLICATE_KEY_ERROR:
+                    return jsonify({'success': False, 'message': 'Email already exists'}), 400
+                raise
+            if cursor.rowcount == 0 and not employee_exists(cursor, employee_id):
+                return jsonify({'success': False, 'message': 'Employee not found'}), 404
             connection.commit()
             
             return jsonify({'success': True, 'message': 'Employee updated successfully'})
@@ -4741,32 +5431,25 @@ def update_employee(employee_id):
         connection.close()
 
 @app.route('/api/hr/employees/<int:employee_id>/approve', methods=['POST'])
+@require_api_role('admin', 'manager')
 def approve_employee(employee_id):
     """Approve pending employee"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
     
     try:
         with connection.cursor() as cursor:
-            # Check if employee exists and is pending
-            cursor.execute("SELECT status FROM employees WHERE id = %s", (employee_id,))
-            result = cursor.fetchone()
-            if not result:
-                return jsonify({'success': False, 'message': 'Employee not found'}), 404
-            
-            if result[0] != 'waiting_approval':
-                return jsonify({'success': False, 'message': 'Employee is not pending approval'}), 400
-            
-            # Approve employee
+            # Approve employee only while pending
             cursor.execute("""
                 UPDATE employees 
                 SET status = 'active', updated_at = CURRENT_TIMESTAMP 
-                WHERE id = %s
+                WHERE id = %s AND status = 'waiting_approval'
             """, (employee_id,))
+            if cursor.rowcount == 0:
+                if not employee_exists(cursor, employee_id):
+                    return jsonify({'success': False, 'message': 'Employee not found'}), 404
+                return jsonify({'success': False, 'message': 'Employee is not pending approval'}), 400
             connection.commit()
             
             return jsonify({'success': True, 'message': 'Employee approved successfully'})
@@ -4778,28 +5461,23 @@ def approve_employee(employee_id):
         connection.close()
 
 @app.route('/api/hr/employees/<int:employee_id>/suspend', methods=['POST'])
+@require_api_role('admin', 'manager')
 def suspend_employee(employee_id):
     """Suspend employee"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
     
     try:
         with connection.cursor() as cursor:
-            # Check if employee exists
-            cursor.execute("SELECT id FROM employees WHERE id = %s", (employee_id,))
-            if not cursor.fetchone():
-                return jsonify({'success': False, 'message': 'Employee not found'}), 404
-            
             # Suspend employee
             cursor.execute("""
                 UPDATE employees 
                 SET status = 'suspended', updated_at = CURRENT_TIMESTAMP 
                 WHERE id = %s
             """, (employee_id,))
+            if cursor.rowcount == 0 and not employee_exists(cursor, employee_id):
+                return jsonify({'success': False, 'message': 'Employee not found'}), 404
             connection.commit()
             
             return jsonify({'success': True, 'message': 'Employee suspended successfully'})
@@ -4811,28 +5489,23 @@ def suspend_employee(employee_id):
         connection.close()
 
 @app.route('/api/hr/employees/<int:employee_id>/activate', methods=['POST'])
+@require_api_role('admin', 'manager')
 def activate_employee(employee_id):
     """Activate employee"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
     
     try:
         with connection.cursor() as cursor:
-            # Check if employee exists
-            cursor.execute("SELECT id FROM employees WHERE id = %s", (employee_id,))
-            if not cursor.fetchone():
-                return jsonify({'success': False, 'message': 'Employee not found'}), 404
-            
             # Activate employee
             cursor.execute("""
                 UPDATE employees 
                 SET status = 'active', updated_at = CURRENT_TIMESTAMP 
                 WHERE id = %s
             """, (employee_id,))
+            if cursor.rowcount == 0 and not employee_exists(cursor, employee_id):
+                return jsonify({'success': False, 'message': 'Employee not found'}), 404
             connection.commit()
             
             return jsonify({'success': True, 'message': 'Employee activated successfully'})
@@ -4844,11 +5517,9 @@ def activate_employee(employee_id):
         connection.close()
 
 @app.route('/api/admin/cashiers', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_cashiers():
     """Get all cashiers for admin cashiers management"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
@@ -4864,14 +5535,8 @@ def get_cashiers():
             """)
             cashiers = cursor.fetchall()
             
-            # Convert datetime objects to strings for JSON serialization
-            for cashier in cashiers:
-                if cashier['created_at']:
-                    cashier['created_at'] = cashier['created_at'].isoformat()
-                if cashier['updated_at']:
-                    cashier['updated_at'] = cashier['updated_at'].isoformat()
-            
-            return jsonify({'success': True, 'cashiers': cashiers})
+            # orjson writes created_at/updated_at as ISO 8601 straight from the rows
+            return json_response({'success': True, 'cashiers': cashiers})
             
     except Exception as e:
         print(f"Error fetching cashiers: {e}")
@@ -4880,11 +5545,9 @@ def get_cashiers():
         connection.close()
 
 @app.route('/api/admin/cash-drawer/sessions/live', methods=['GET'])
+@require_api_role('admin', 'manager')
 def admin_live_cash_drawer_sessions():
     """Return active cash drawer sessions for all cashiers, including current balance snapshot."""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
@@ -5153,11 +5816,9 @@ def admin_live_cash_drawer_sessions():
         connection.close()
 
 @app.route('/api/admin/cash-drawer/sessions/with-transactions', methods=['GET'])
+@require_api_role('admin', 'manager')
 def admin_sessions_with_transactions():
     """Return recent sessions with all their transactions (optionally filter by date or cashier)."""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-
     selected_date = request.args.get('date')  # YYYY-MM-DD
     cashier_id = request.args.get('cashier_id')
     session_id = request.args.get('session_id')
@@ -5232,11 +5893,9 @@ def admin_sessions_with_transactions():
         connection.close()
 
 @app.route('/api/admin/expenses-incurred', methods=['GET'])
+@require_api_role('admin', 'manager')
 def admin_expenses_incurred_api():
     """Return cash outs and safe drops, filterable by date range and cashier."""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-
     start_date = request.args.get('start_date')  # YYYY-MM-DD
     end_date = request.args.get('end_date')      # YYYY-MM-DD
     cashier_id = request.args.get('cashier_id')
@@ -5334,11 +5993,9 @@ def admin_expenses_incurred_api():
         connection.close()
 
 @app.route('/api/hr/employees/<int:employee_id>', methods=['DELETE'])
+@require_api_role('admin', 'manager')
 def delete_employee(employee_id):
     """Delete employee"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     # Prevent admin from deleting themselves
     if employee_id == session.get('employee_id'):
         return jsonify({'success': False, 'message': 'You cannot delete your own account'}), 400
@@ -5349,13 +6006,10 @@ def delete_employee(employee_id):
     
     try:
         with connection.cursor() as cursor:
-            # Check if employee exists
-            cursor.execute("SELECT id FROM employees WHERE id = %s", (employee_id,))
-            if not cursor.fetchone():
-                return jsonify({'success': False, 'message': 'Employee not found'}), 404
-            
             # Delete employee
             cursor.execute("DELETE FROM employees WHERE id = %s", (employee_id,))
+            if cursor.rowcount == 0:
+                return jsonify({'success': False, 'message': 'Employee not found'}), 404
             connection.commit()
             
             return jsonify({'success': True, 'message': 'Employee deleted successfully'})
@@ -5366,6 +6020,89 @@ def delete_employee(employee_id):
     finally:
         connection.close()
 
+# Bulk HR actions: action -> (new status, status the employee must currently have)
+BULK_EMPLOYEE_STATUS_ACTIONS = {
+    'approve': ('active', 'waiting_approval'),
+    'suspend': ('suspended', None),
+    'activate': ('active', None),
+}
+BULK_EMPLOYEE_MAX_IDS = 500
+
+@app.route('/api/hr/employees/bulk', methods=['POST'])
+@require_api_role('admin', 'manager')
+def bulk_employee_action():
+    """Approve, suspend, activate or delete several employees in one statement"""
+    data = request.get_json(silent=True) or {}
+    action = data.get('action')
+    ids = data.get('ids')
+    if action not in BULK_EMPLOYEE_STATUS_ACTIONS and action != 'delete':
+        return jsonify({'success': False, 'message': 'Invalid action'}), 400
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({'success': False, 'message': 'ids must be a non-empty list of employee ids'}), 400
+    if len(ids) > BULK_EMPLOYEE_MAX_IDS:
+        return jsonify({'success': False, 'message': f'At most {BULK_EMPLOYEE_MAX_IDS} employees per request'}), 400
+    
+    ids = list(set(ids))
+    placeholders = ', '.join(['%s'] * len(ids))
+    # The acting employee is always left out, as with the single-employee endpoints
+    params = ids + [session.get('employee_id')]
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({'success': False, 'message': 'Database connection error'}), 500
+    
+    try:
+        with connection.cursor() as cursor:
+            if action == 'delete':
+                try:
+                    cursor.execute(f"DELETE FROM employees WHERE id IN ({placeholders}) AND id <> %s", params)
+                except pymysql.err.IntegrityError as e:
+                    if e.args[0] != ROW_REFERENCED_ERROR:
+                        raise
+                    # Some employees still have sales or other records: delete the
+                    # rest one by one (a failed statement leaves the others intact)
+                    affected = 0
+                    blocked_ids = []
+                    for employee_id in ids:
+                        if employee_id == session.get('employee_id'):
+                            continue
+                        try:
+                            cursor.execute("DELETE FROM employees WHERE id = %s", (employee_id,))
+                            affected += cursor.rowcount
+                        except pymysql.err.IntegrityError as e:
+                            if e.args[0] != ROW_REFERENCED_ERROR:
+                                raise
+                            blocked_ids.append(employee_id)
+                    connection.commit()
+                    return jsonify({
+                        'success': False,
+                        'message': f'{affected} employee(s) deleted; {len(blocked_ids)} could not be deleted because they have sales or other records',
+                        'affected': affected,
+                        'blocked_ids': sorted(blocked_ids)
+                    }), 409
+            else:
+                new_status, required_status = BULK_EMPLOYEE_STATUS_ACTIONS[action]
+                query = f"""
+                    UPDATE employees 
+                    SET status = %s, updated_at = CURRENT_TIMESTAMP 
+                    WHERE id IN ({placeholders}) AND id <> %s
+                """
+                params = [new_status] + params
+                if required_status:
+                    query += " AND status = %s"
+                    params.append(required_status)
+                cursor.execute(query, params)
+            affected = cursor.rowcount
+            connection.commit()
+            
+            return jsonify({'success': True, 'message': f'{affected} employee(s) updated', 'affected': affected})
+            
+    except Exception as e:
+        app.logger.exception("Error running bulk employee action: %s", e)
+        return jsonify({'success': False, 'message': 'An error occurred while updating employees'}), 500
+    finally:
+        connection.close()
+
 @app.route('/api/off-days/calendar/<int:year>/<int:month>', methods=['GET'])
 def get_off_days_calendar(year, month):
     """Get off days calendar data for a specific month
@@ -5488,11 +6225,9 @@ def get_off_days_calendar(year, month):
         connection.close()
 
 @app.route('/api/off-days/employee/<int:employee_id>/stats', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_employee_off_days_stats(employee_id):
     """Get off days statistics for a specific employee"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
@@ -5556,11 +6291,9 @@ def get_employee_off_days_stats(employee_id):
         connection.close()
 
 @app.route('/api/off-days/check-range', methods=['GET'])
+@require_api_role('admin', 'manager')
 def check_off_days_range():
     """Check for existing off days in a date range for an employee"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     employee_id = request.args.get('employee_id')
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
@@ -5606,11 +6339,9 @@ def check_off_days_range():
         connection.close()
 
 @app.route('/api/off-days/register-range', methods=['POST'])
+@require_api_role('admin', 'manager')
 def register_off_days_range():
     """Register or update off days for a date range (admin/manager only)"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json() or {}
     required = ['employee_id', 'start_date', 'end_date', 'off_type', 'status']
     for field in required:
@@ -5651,7 +6382,6 @@ def register_off_days_range():
             existing_dates = {row[1].strftime('%Y-%m-%d'): row[0] for row in existing_off_days}
             
             # Generate all dates in the range
-            from datetime import datetime, timedelta
             start = datetime.strptime(start_date, '%Y-%m-%d')
             end = datetime.strptime(end_date, '%Y-%m-%d')
             current_date = start
@@ -5826,11 +6556,9 @@ def get_off_day(off_day_id):
         connection.close()
 
 @app.route('/api/off-days/<int:off_day_id>/range', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_off_day_range(off_day_id):
     """Get the date range for consecutive off days with same type/status/reason (admin/manager only)"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
@@ -5923,11 +6651,9 @@ def get_off_day_range(off_day_id):
         connection.close()
 
 @app.route('/api/off-days/<int:off_day_id>', methods=['PUT'])
+@require_api_role('admin', 'manager')
 def update_off_day(off_day_id):
     """Update a single off day (admin/manager only)"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json() or {}
     required = ['off_date', 'off_type', 'status']
     for field in required:
@@ -5983,11 +6709,9 @@ def update_off_day(off_day_id):
         connection.close()
 
 @app.route('/api/off-days/<int:off_day_id>', methods=['DELETE'])
+@require_api_role('admin', 'manager')
 def delete_off_day(off_day_id):
     """Delete a single off day (admin/manager only)"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
@@ -6015,11 +6739,9 @@ def delete_off_day(off_day_id):
         connection.close()
 
 @app.route('/api/off-days/<int:off_day_id>/approve', methods=['POST'])
+@require_api_role('admin', 'manager')
 def approve_off_day(off_day_id):
     """Approve an off day (admin/manager only)"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
@@ -6052,11 +6774,9 @@ def approve_off_day(off_day_id):
         connection.close()
 
 @app.route('/api/off-days/<int:off_day_id>/decline', methods=['POST'])
+@require_api_role('admin', 'manager')
 def decline_off_day(off_day_id):
     """Decline (reject) an off day (admin/manager only)"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
@@ -6255,7 +6975,6 @@ def request_employee_off_day():
         return jsonify({'success': False, 'message': 'End date must be after start date'}), 400
     
     # Validate that dates are not in the past
-    from datetime import datetime, timedelta
     today = datetime.now().date()
     start = datetime.strptime(start_date, '%Y-%m-%d').date()
     
@@ -6328,36 +7047,29 @@ def request_employee_off_day():
         connection.close()
 
 @app.route('/api/hr/stats', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_hr_stats():
     """Get HR statistics"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
     
     try:
         with connection.cursor(pymysql.cursors.DictCursor) as cursor:
-            # Get total employees
-            cursor.execute("SELECT COUNT(*) as total FROM employees")
-            total_employees = cursor.fetchone()['total']
-            
-            # Get employees by status
-            cursor.execute("""
-                SELECT status, COUNT(*) as count 
-                FROM employees 
-                GROUP BY status
-            """)
-            status_counts = {row['status']: row['count'] for row in cursor.fetchall()}
-            
-            # Get employees by role
+            # Count each status/role pair in one scan, then fold into the
+            # per-status and per-role totals
             cursor.execute("""
-                SELECT role, COUNT(*) as count 
+                SELECT status, role, COUNT(*) as count 
                 FROM employees 
-                GROUP BY role
+                GROUP BY status, role
             """)
-            role_counts = {row['role']: row['count'] for row in cursor.fetchall()}
+            total_employees = 0
+            status_counts = {}
+            role_counts = {}
+            for row in cursor.fetchall():
+                total_employees += row['count']
+                status_counts[row['status']] = status_counts.get(row['status'], 0) + row['count']
+                role_counts[row['role']] = role_counts.get(row['role'], 0) + row['count']
             
             return jsonify({
                 'success': True,
@@ -6383,7 +7095,7 @@ def get_items():
         return jsonify({'success': False, 'message': 'Database connection failed'})
     
     try:
-        with connection.cursor() as cursor:
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
             cursor.execute("""
                 SELECT id, name, description, price, category, stock, status, 
                        image_url, sku, stock_update_enabled, created_at, updated_at
@@ -6392,24 +7104,13 @@ def get_items():
             """)
             items = cursor.fetchall()
             
-            items_list = []
+            # Fix up the rows in place; orjson writes created_at/updated_at as ISO 8601
             for item in items:
-                items_list.append({
-                    'id': item[0],
-                    'name': item[1],
-                    'description': item[2],
-                    'price': float(item[3]) if item[3] else 0.0,
-                    'category': item[4],
-                    'stock': item[5] or 0,
-                    'status': item[6],
-                    'image_url': item[7],
-                    'sku': item[8],
-                    'stock_update_enabled': bool(item[9]) if item[9] is not None else True,
-                    'created_at': item[10].isoformat() if item[10] else None,
-                    'updated_at': item[11].isoformat() if item[11] else None
-                })
+                item['price'] = float(item['price']) if item['price'] else 0.0
+                item['stock'] = item['stock'] or 0
+                item['stock_update_enabled'] = bool(item['stock_update_enabled']) if item['stock_update_enabled'] is not None else True
             
-            return jsonify({'success': True, 'items': items_list})
+            return json_response({'success': True, 'items': items})
             
     except Exception as e:
         print(f"Error fetching items: {e}")
@@ -6417,15 +7118,38 @@ def get_items():
     finally:
         connection.close()
 
+# Every POS page load fetches the item grid, so each process keeps the rendered
+# JSON briefly (with an ETag for conditional requests) and drops it whenever
+# items or their stock change
+POS_ITEMS_CACHE_TTL = 30
+_pos_items_cache = {'entry': None, 'version': 0}
+
+def invalidate_pos_items_cache():
+    """Mark the cached POS item list as outdated after items or stock change"""
+    _pos_items_cache['version'] += 1
+
+def pos_items_response(body, etag):
+    """Serve the POS item list, answering 304 when the client already has it"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Clients must revalidate: stock moves with every sale
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @app.route('/api/pos/items', methods=['GET'])
 def get_pos_items():
     """Get active items for POS system"""
+    version = _pos_items_cache['version']
+    entry = _pos_items_cache['entry']
+    if entry and entry[0] == version and time.monotonic() - entry[1] < POS_ITEMS_CACHE_TTL:
+        return pos_items_response(entry[2], entry[3])
+    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection failed'})
     
     try:
-        with connection.cursor() as cursor:
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
             # Get only active items for POS
             cursor.execute("""
                 SELECT id, name, description, price, category, stock, 
@@ -6436,21 +7160,15 @@ def get_pos_items():
             """)
             items = cursor.fetchall()
             
-            items_list = []
             for item in items:
-                items_list.append({
-                    'id': item[0],
-                    'name': item[1],
-                    'description': item[2],
-                    'price': float(item[3]) if item[3] else 0.0,
-                    'category': item[4],
-                    'stock': item[5] or 0,
-                    'image_url': item[6],
-                    'sku': item[7],
-                    'stock_update_enabled': bool(item[8]) if item[8] is not None else True
-                })
+                item['price'] = float(item['price']) if item['price'] else 0.0
+                item['stock'] = item['stock'] or 0
+                item['stock_update_enabled'] = bool(item['stock_update_enabled']) if item['stock_update_enabled'] is not None else True
             
-            return jsonify({'success': True, 'items': items_list})
+            body = orjson.dumps({'success': True, 'items': items}, default=_json_default)
+            etag = hashlib.md5(body).hexdigest()
+            _pos_items_cache['entry'] = (version, time.monotonic(), body, etag)
+            return pos_items_response(body, etag)
             
     except Exception as e:
         print(f"Error fetching POS items: {e}")
@@ -6458,6 +7176,56 @@ def get_pos_items():
     finally:
         connection.close()
 
+SALE_INSERT = """
+    INSERT INTO sales (
+        receipt_number, employee_id, employee_name, 
+        subtotal, tax_amount, total_amount, tax_included, sale_date, status
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# PyMySQL's executemany() rewrites this into multi-row VALUES statements
+# (split to stay under the packet limit), so a sale's items cost one round trip
+SALES_ITEMS_INSERT = """
+    INSERT INTO sales_items (sale_id, item_id, item_name, quantity, unit_price, total_price)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+# created_at is left to the column default so the statement stays batchable
+STOCK_OUT_TRANSACTION_INSERT = """
+    INSERT INTO stock_transactions 
+    (item_id, action, quantity, price_per_unit, total_amount, 
+     employee_id, employee_name, transaction_type, selling_price, reason)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def fetch_active_items_stock(cursor, item_ids):
+    """Map each active item id to its (stock, stock_update_enabled, name) in one query"""
+    item_ids = list(set(item_ids))
+    if not item_ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(item_ids))
+    cursor.execute(f"""
+        SELECT id, stock, stock_update_enabled, name 
+        FROM items 
+        WHERE status = 'active' AND id IN ({placeholders})
+    """, item_ids)
+    return {row[0]: row[1:] for row in cursor.fetchall()}
+
+def decrement_items_stock(cursor, sold_quantities):
+    """Subtract sold quantities ({item_id: quantity}) from item stock in one UPDATE"""
+    if not sold_quantities:
+        return
+    cases = ' '.join(['WHEN %s THEN %s'] * len(sold_quantities))
+    placeholders = ', '.join(['%s'] * len(sold_quantities))
+    params = [value for pair in sold_quantities.items() for value in pair]
+    params.extend(sold_quantities)
+    cursor.execute(f"""
+        UPDATE items 
+        SET stock = COALESCE(stock, 0) - CASE id {cases} END,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id IN ({placeholders})
+    """, params)
+
 @app.route('/api/pos/process-sale', methods=['POST'])
 def process_pos_sale():
     """Process a POS sale and update stock for items with stock tracking enabled"""
@@ -6490,109 +7258,77 @@ def process_pos_sale():
         receipt_number = f"POS{datetime.now().strftime('%Y%m%d%H%M%S')}"
         
         with connection.cursor() as cursor:
-            # Check if receipt number already exists
-            cursor.execute("SELECT id FROM sales WHERE receipt_number = %s", (receipt_number,))
-            if cursor.fetchone():
-                receipt_number = f"POS{datetime.now().strftime('%Y%m%d%H%M%S')}{random.randint(100, 999)}"
-            
-            # Insert sale record
-            cursor.execute("""
-                INSERT INTO sales (
-                    receipt_number, employee_id, employee_name, 
-                    subtotal, tax_amount, total_amount, tax_included, sale_date, status
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                receipt_number, employee_id, employee_name, 
+            sale_values = (
+                employee_id, employee_name, 
                 subtotal, tax_amount, total_amount, data.get('tax_included', True), 
                 data.get('sale_date', datetime.now().strftime('%Y-%m-%d %H:%M:%S')), 'completed'
-            ))
+            )
+            # Insert sale record; the unique receipt_number index catches a
+            # same-second collision, which gets a random suffix instead
+            try:
+                cursor.execute(SALE_INSERT, (receipt_number,) + sale_values)
+            except pymysql.err.IntegrityError as e:
+                if e.args[0] != DUPLICATE_KEY_ERROR:
+                    raise
+                receipt_number = f"POS{datetime.now().strftime('%Y%m%d%H%M%S')}{random.randint(100, 999)}"
+                cursor.execute(SALE_INSERT, (receipt_number,) + sale_values)
             
             sale_id = cursor.lastrowid
             print(f"[SAVE] Sale record created - ID: {sale_id}, Receipt: {receipt_number}")
             
-            # Process each item in the order
+            # Keep only valid lines, then read stock for all of their items at once
+            valid_items = []
             for item in order_items:
-                item_id = item.get('id')
-                quantity = item.get('quantity', 0)
-                price = item.get('price', 0)
-                
-                print(f"[ITEM] Processing item {item_id}: {quantity}x @ {price}")
-                
-                if not item_id or quantity <= 0:
+                if not item.get('id') or item.get('quantity', 0) <= 0:
                     print(f"[WARN] Skipping invalid item: {item}")
                     continue
+                valid_items.append(item)
+            stock_info = fetch_active_items_stock(cursor, [item['id'] for item in valid_items])
+            
+            # Process each item in the order
+            sale_item_rows = []
+            stock_transaction_rows = []
+            sold_quantities = {}
+            for item in valid_items:
+                item_id = item['id']
+                quantity = item['quantity']
+                price = item.get('price', 0)
                 
-                # Insert sale item
-                cursor.execute("""
-                    INSERT INTO sales_items (sale_id, item_id, item_name, quantity, unit_price, total_price)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (
-                    sale_id, item_id, item.get('name', ''), quantity, price, price * quantity
-                ))
+                print(f"[ITEM] Processing item {item_id}: {quantity}x @ {price}")
                 
-                # Check if item exists and get current stock info
-                cursor.execute("""
-                    SELECT stock, stock_update_enabled, name 
-                    FROM items 
-                    WHERE id = %s AND status = 'active'
-                """, (item_id,))
+                sale_item_rows.append((sale_id, item_id, item.get('name', ''), quantity, price, price * quantity))
                 
-                result = cursor.fetchone()
-                if not result:
+                if item_id not in stock_info:
                     print(f"[WARN] Item {item_id} not found or inactive")
                     continue
                 
-                # Debug: Let's also check what's in the database for this item
-                cursor.execute("""
-                    SELECT id, name, stock_update_enabled, status 
-                    FROM items 
-                    WHERE id = %s
-                """, (item_id,))
-                debug_result = cursor.fetchone()
-                if debug_result:
-                    print(f"[DEBUG] Item {item_id}: name='{debug_result[1]}', stock_update_enabled={debug_result[2]}, status='{debug_result[3]}'")
-                
-                current_stock = result[0] or 0
-                stock_update_enabled_raw = result[1]
+                current_stock, stock_update_enabled_raw, item_name = stock_info[item_id]
                 stock_update_enabled = stock_update_enabled_raw if stock_update_enabled_raw is not None else True
-                item_name = result[2]
-                
-                print(f"[STOCK] Item: {item_name}")
-                print(f"   Current stock: {current_stock}")
-                print(f"   Stock tracking raw value: {stock_update_enabled_raw} (type: {type(stock_update_enabled_raw)})")
-                print(f"   Stock tracking enabled: {stock_update_enabled}")
                 
                 # Only update stock if stock tracking is enabled
                 if stock_update_enabled:
-                    new_stock = current_stock - quantity
-                    
-                    # Update item stock
-                    cursor.execute("""
-                        UPDATE items 
-                        SET stock = %s, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = %s
-                    """, (new_stock, item_id))
-                    
-                    print(f"[SUCCESS] Stock updated: {current_stock} -> {new_stock} (sold {quantity})")
+                    sold_quantities[item_id] = sold_quantities.get(item_id, 0) + quantity
+                    print(f"[STOCK] {item_name}: {current_stock or 0} in stock, selling {quantity}")
                 else:
                     print(f"[SKIP] Stock tracking disabled for {item_name}")
                 
                 # Log stock out transaction (regardless of stock tracking setting)
-                cursor.execute("""
-                    INSERT INTO stock_transactions 
-                    (item_id, action, quantity, price_per_unit, total_amount, 
-                     employee_id, employee_name, transaction_type, selling_price, 
-                     reason, created_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
-                """, (
+                stock_transaction_rows.append((
                     item_id, 'stock_out', quantity, price, 
                     price * quantity, employee_id, employee_name, 
                     'sale', price, 'POS Sale'
                 ))
-                
-                print(f"[LOG] Stock transaction logged for {item_name}")
+            
+            decrement_items_stock(cursor, sold_quantities)
+            
+            # Insert all sale items and stock transactions in multi-row statements
+            cursor.executemany(SALES_ITEMS_INSERT, sale_item_rows)
+            cursor.executemany(STOCK_OUT_TRANSACTION_INSERT, stock_transaction_rows)
+            print(f"[LOG] {len(stock_transaction_rows)} stock transactions logged")
             
             connection.commit()
+            invalidate_pos_items_cache()
+            invalidate_dashboard_cache()
             print(f"[SUCCESS] POS Sale completed successfully - Receipt: {receipt_number}")
             
             return jsonify({
@@ -6646,11 +7382,9 @@ def debug_stock_settings():
         connection.close()
 
 @app.route('/api/stock-settings', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_stock_settings():
     """Get stock settings"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection failed'})
@@ -6692,11 +7426,9 @@ def get_stock_settings():
         connection.close()
 
 @app.route('/api/stock-settings', methods=['POST'])
+@require_api_role('admin', 'manager')
 def update_stock_settings():
     """Update stock settings"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json()
     setting_name = data.get('setting_name')
     setting_value = data.get('setting_value')
@@ -6717,6 +7449,7 @@ def update_stock_settings():
             """, (setting_name, setting_value, setting_value))
             
             connection.commit()
+            invalidate_hotel_settings_cache()
             
             return jsonify({
                 'success': True,
@@ -6730,11 +7463,9 @@ def update_stock_settings():
         connection.close()
 
 @app.route('/api/stock/settings', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_stock_settings_api():
     """Get stock settings for the frontend"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection failed'})
@@ -6770,11 +7501,9 @@ def get_stock_settings_api():
         connection.close()
 
 @app.route('/api/stock/settings', methods=['POST'])
+@require_api_role('admin', 'manager')
 def update_stock_settings_api():
     """Update stock settings for the frontend"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json()
     default_low_stock_threshold = data.get('defaultLowStockThreshold')
     default_percentage_threshold = data.get('defaultPercentageThreshold')
@@ -6801,6 +7530,7 @@ def update_stock_settings_api():
                 """, (setting_name, setting_value))
             
             connection.commit()
+            invalidate_hotel_settings_cache()
             return jsonify({'success': True, 'message': 'Stock settings updated successfully'})
     
     except Exception as e:
@@ -6810,11 +7540,9 @@ def update_stock_settings_api():
         connection.close()
 
 @app.route('/api/stock/item-threshold', methods=['POST'])
+@require_api_role('admin', 'manager')
 def update_item_threshold():
     """Update low stock threshold for a specific item"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json()
     item_id = data.get('item_id')
     threshold = data.get('threshold')
@@ -6848,11 +7576,9 @@ def update_item_threshold():
         connection.close()
 
 @app.route('/api/stock-analytics/enhanced', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_enhanced_stock_analytics():
     """Get enhanced stock analytics with detailed insights"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection failed'})
@@ -7028,11 +7754,9 @@ def get_enhanced_stock_analytics():
         connection.close()
 
 @app.route('/api/items', methods=['POST'])
+@require_api_role('admin', 'manager')
 def create_item():
     """Create a new item"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection failed'})
@@ -7071,6 +7795,7 @@ def create_item():
             """, (name, description, price, category, 0, 'active', image_url, sku))
             
             connection.commit()
+            invalidate_pos_items_cache()
             return jsonify({'success': True, 'message': 'Item created successfully'})
             
     except Exception as e:
@@ -7120,12 +7845,16 @@ def get_item(item_id):
         return jsonify({'success': False, 'message': 'Failed to fetch item'})
     finally:
         connection.close()
+
+def item_exists(cursor, item_id):
+    """Tell a missing item apart from an UPDATE that changed nothing (see employee_exists)"""
+    cursor.execute("SELECT 1 FROM items WHERE id = %s", (item_id,))
+    return cursor.fetchone() is not None
+
 @app.route('/api/items/<int:item_id>', methods=['PUT'])
+@require_api_role('admin', 'manager')
 def update_item(item_id):
     """Update an existing item"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection failed'})
@@ -7155,11 +7884,6 @@ def update_item(item_id):
                 image_url = f'/static/uploads/{filename}'
         
         with connection.cursor() as cursor:
-            # Check if item exists
-            cursor.execute("SELECT id FROM items WHERE id = %s", (item_id,))
-            if not cursor.fetchone():
-                return jsonify({'success': False, 'message': 'Item not found'})
-            
             # Update item
             if image_url:
                 cursor.execute("""
@@ -7175,8 +7899,11 @@ def update_item(item_id):
                         updated_at = CURRENT_TIMESTAMP
                     WHERE id = %s
                 """, (name, description, price, category, item_id))
+            if cursor.rowcount == 0 and not item_exists(cursor, item_id):
+                return jsonify({'success': False, 'message': 'Item not found'})
             
             connection.commit()
+            invalidate_pos_items_cache()
             return jsonify({'success': True, 'message': 'Item updated successfully'})
             
     except Exception as e:
@@ -7186,25 +7913,21 @@ def update_item(item_id):
         connection.close()
 
 @app.route('/api/items/<int:item_id>', methods=['DELETE'])
+@require_api_role('admin', 'manager')
 def delete_item(item_id):
     """Delete an item"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection failed'})
     
     try:
         with connection.cursor() as cursor:
-            # Check if item exists
-            cursor.execute("SELECT id FROM items WHERE id = %s", (item_id,))
-            if not cursor.fetchone():
-                return jsonify({'success': False, 'message': 'Item not found'})
-            
             # Delete item
             cursor.execute("DELETE FROM items WHERE id = %s", (item_id,))
+            if cursor.rowcount == 0:
+                return jsonify({'success': False, 'message': 'Item not found'})
             connection.commit()
+            invalidate_pos_items_cache()
             return jsonify({'success': True, 'message': 'Item deleted successfully'})
             
     except Exception as e:
@@ -7228,19 +7951,17 @@ def update_item_status(item_id):
             return jsonify({'success': False, 'message': 'Invalid status. Must be active or inactive'})
         
         with connection.cursor() as cursor:
-            # Check if item exists
-            cursor.execute("SELECT id FROM items WHERE id = %s", (item_id,))
-            if not cursor.fetchone():
-                return jsonify({'success': False, 'message': 'Item not found'})
-            
             # Update status
             cursor.execute("""
                 UPDATE items 
                 SET status = %s, updated_at = CURRENT_TIMESTAMP
                 WHERE id = %s
             """, (status, item_id))
+            if cursor.rowcount == 0 and not item_exists(cursor, item_id):
+                return jsonify({'success': False, 'message': 'Item not found'})
             
             connection.commit()
+            invalidate_pos_items_cache()
             return jsonify({'success': True, 'message': f'Item {status} successfully'})
             
     except Exception as e:
@@ -7264,17 +7985,15 @@ def toggle_stock_update(item_id):
             return jsonify({'success': False, 'message': 'Invalid stock update setting'})
         
         with connection.cursor() as cursor:
-            # Check if item exists
-            cursor.execute("SELECT id FROM items WHERE id = %s", (item_id,))
-            if not cursor.fetchone():
-                return jsonify({'success': False, 'message': 'Item not found'})
-            
             cursor.execute("""
                 UPDATE items 
                 SET stock_update_enabled = %s, updated_at = CURRENT_TIMESTAMP
                 WHERE id = %s
             """, (stock_update_enabled, item_id))
+            if cursor.rowcount == 0 and not item_exists(cursor, item_id):
+                return jsonify({'success': False, 'message': 'Item not found'})
             connection.commit()
+            invalidate_pos_items_cache()
             
             status_text = "enabled" if stock_update_enabled else "disabled"
             return jsonify({'success': True, 'message': f'Stock update tracking {status_text}'})
@@ -7286,11 +8005,9 @@ def toggle_stock_update(item_id):
         connection.close()
 
 @app.route('/api/items/<int:item_id>/stock', methods=['POST'])
+@require_api_role('admin', 'manager')
 def update_item_stock(item_id):
     """Update item stock (stock in/out) with detailed transaction information"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection failed'})
@@ -7367,6 +8084,7 @@ def update_item_stock(item_id):
             ))
             
             connection.commit()
+            invalidate_pos_items_cache()
             
             if stock_update_enabled:
                 return jsonify({'success': True, 'message': f'Stock updated successfully. New stock: {new_stock}'})
@@ -7440,78 +8158,59 @@ def save_sale_to_database():
         
         try:
             with connection.cursor() as cursor:
-                # Check for duplicate receipt number
-                cursor.execute("SELECT id FROM sales WHERE receipt_number = %s", (receipt_number,))
-                if cursor.fetchone():
-                    return jsonify({'success': False, 'message': 'Receipt number already exists'}), 400
-                
-                # Insert sale record (without employee_code for confidentiality)
-                cursor.execute("""
-                    INSERT INTO sales (receipt_number, employee_id, employee_name, 
-                                     subtotal, tax_amount, total_amount, tax_included, sale_date, status)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (receipt_number, employee_id, employee_name, subtotal, tax_amount, total_amount, tax_included, data.get('sale_date', datetime.now().strftime('%Y-%m-%d %H:%M:%S')), 'pending'))
+                # Insert sale record (without employee_code for confidentiality);
+                # the unique receipt_number index rejects duplicates
+                try:
+                    cursor.execute(SALE_INSERT, (receipt_number, employee_id, employee_name, subtotal, tax_amount, total_amount, tax_included, data.get('sale_date', datetime.now().strftime('%Y-%m-%d %H:%M:%S')), 'pending'))
+                except pymysql.err.IntegrityError as e:
+                    if e.args[0] == DUPLICATE_KEY_ERROR:
+                        return jsonify({'success': False, 'message': 'Receipt number already exists'}), 400
+                    raise
                 
                 sale_id = cursor.lastrowid
                 
-                # Insert sale items and update stock
-                for item in items:
-                    item_id = item.get('id')
-                    quantity = item.get('quantity', 0)
-                    
-                    # Insert sale item
-                    cursor.execute("""
-                        INSERT INTO sales_items (sale_id, item_id, item_name, quantity, unit_price, total_price)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                    """, (
+                # Insert all sale items in one multi-row statement
+                cursor.executemany(SALES_ITEMS_INSERT, [
+                    (
                         sale_id,
-                        item_id,
+                        item.get('id'),
                         item.get('name'),
-                        quantity,
+                        item.get('quantity', 0),
                         item.get('price'),
-                        quantity * item.get('price', 0)
-                    ))
-                    
-                    # Update stock if stock tracking is enabled
-                    cursor.execute("""
-                        SELECT stock, stock_update_enabled, name 
-                        FROM items 
-                        WHERE id = %s AND status = 'active'
-                    """, (item_id,))
+                        item.get('quantity', 0) * item.get('price', 0)
+                    )
+                    for item in items
+                ])
+                
+                # Update stock for active items with stock tracking enabled
+                stock_info = fetch_active_items_stock(cursor, [item.get('id') for item in items])
+                stock_transaction_rows = []
+                sold_quantities = {}
+                for item in items:
+                    item_id = item.get('id')
+                    quantity = item.get('quantity', 0)
                     
-                    result = cursor.fetchone()
-                    if result:
-                        current_stock = result[0] or 0
-                        stock_update_enabled = result[1] if result[1] is not None else True
-                        item_name = result[2]
+                    if item_id in stock_info:
+                        current_stock, stock_update_enabled, item_name = stock_info[item_id]
                         
                         # Only update stock if stock tracking is enabled
-                        if stock_update_enabled:
-                            new_stock = current_stock - quantity
-                            
-                            # Update item stock
-                            cursor.execute("""
-                                UPDATE items 
-                                SET stock = %s, updated_at = CURRENT_TIMESTAMP
-                                WHERE id = %s
-                            """, (new_stock, item_id))
-                            
-                            print(f"Updated stock for {item_name}: {current_stock} -> {new_stock} (sold {quantity})")
+                        if stock_update_enabled is None or stock_update_enabled:
+                            sold_quantities[item_id] = sold_quantities.get(item_id, 0) + quantity
+                            print(f"Updating stock for {item_name}: {current_stock or 0} in stock (sold {quantity})")
                         
                         # Log stock out transaction
-                        cursor.execute("""
-                            INSERT INTO stock_transactions 
-                            (item_id, action, quantity, price_per_unit, total_amount, 
-                             employee_id, employee_name, transaction_type, selling_price, 
-                             reason, created_at)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
-                        """, (
+                        stock_transaction_rows.append((
                             item_id, 'stock_out', quantity, item.get('price', 0), 
                             quantity * item.get('price', 0), employee_id, employee_name, 
                             'sale', item.get('price', 0), f'Sale - Receipt {receipt_number}'
                         ))
                 
+                decrement_items_stock(cursor, sold_quantities)
+                cursor.executemany(STOCK_OUT_TRANSACTION_INSERT, stock_transaction_rows)
+                
                 connection.commit()
+                invalidate_pos_items_cache()
+                invalidate_dashboard_cache()
                 
                 print(f"[SUCCESS] Sale saved successfully - Receipt: {receipt_number}, Sale ID: {sale_id}")
                 print(f"   Items sold: {len(items)}")
@@ -7545,14 +8244,7 @@ def get_next_receipt_number_from_db():
         
         cursor = connection.cursor()
         
-        # Get the next receipt number (starting from 1001 if no sales exist)
-        cursor.execute("""
-            SELECT COALESCE(MAX(CAST(receipt_number AS UNSIGNED)), 1000) + 1 as next_receipt_number
-            FROM sales
-        """)
-        
-        result = cursor.fetchone()
-        next_receipt_number = result[0] if result else 1001
+        next_receipt_number = reserve_receipt_number(cursor)
         
         return jsonify({
             'success': True,
@@ -7569,6 +8261,7 @@ def get_next_receipt_number_from_db():
 @app.route('/api/receipts', methods=['GET'])
 def get_receipts():
     """Get list of all printed receipts for reprinting with optional date filter"""
+    connection = None
     try:
         connection = get_db_connection()
         if not connection:
@@ -7586,8 +8279,12 @@ def get_receipts():
         params = []
         
         if date_filter:
-            where_conditions.append("DATE(s.sale_date) = %s")
-            params.append(date_filter)
+            try:
+                bounds = date_bounds('single', date_filter)
+            except ValueError:
+                return jsonify({'success': False, 'message': 'Invalid date, expected YYYY-MM-DD'}), 400
+            where_conditions.append("s.sale_date >= %s AND s.sale_date < %s")
+            params.extend(bounds)
         
         if status_filter == 'confirmed':
             where_conditions.append("s.cashier_confirmed = 1")
@@ -7613,11 +8310,9 @@ def get_receipts():
                 s.sale_date,
                 s.status,
                 COALESCE(s.cashier_confirmed, 0) as cashier_confirmed,
-                COUNT(si.id) as item_count
+                {sale_item_count_column()}
             FROM sales s
-            LEFT JOIN sales_items si ON s.id = si.sale_id
             {where_clause}
-            GROUP BY s.id
             ORDER BY s.sale_date DESC
             LIMIT 100
         """
@@ -7795,21 +8490,19 @@ def reprint_receipt(receipt_id):
         
         cursor = connection.cursor()
         
-        # Verify employee exists and is active
+        # Verify the employee is active and look up the receipt in the same query
         cursor.execute("""
-            SELECT id, full_name, employee_code 
-            FROM employees 
-            WHERE employee_code = %s AND status = 'active'
-        """, (employee_code,))
+            SELECT e.id, e.full_name, e.employee_code, s.id, s.receipt_number
+            FROM employees e
+            LEFT JOIN sales s ON s.id = %s
+            WHERE e.employee_code = %s AND e.status = 'active'
+        """, (receipt_id, employee_code))
         
-        employee = cursor.fetchone()
-        if not employee:
+        row = cursor.fetchone()
+        if not row:
             return jsonify({'success': False, 'message': 'Invalid employee code'}), 400
-        
-        # Verify receipt exists
-        cursor.execute("SELECT id, receipt_number FROM sales WHERE id = %s", (receipt_id,))
-        receipt = cursor.fetchone()
-        if not receipt:
+        employee, receipt = row[:3], row[3:]
+        if receipt[0] is None:
             return jsonify({'success': False, 'message': 'Receipt not found'}), 404
         
         # Log the reprint action to the sales table
@@ -7821,6 +8514,7 @@ def reprint_receipt(receipt_id):
         """, (receipt_id,))
         
         connection.commit()
+        invalidate_dashboard_cache()
         
         # Log the reprint action
         print(f"Receipt #{receipt[1]} reprinted by employee {employee[1]} ({employee[2]})")
@@ -7892,6 +8586,7 @@ def toggle_cashier_confirmation(receipt_id):
             """, (receipt_id,))
         
         connection.commit()
+        invalidate_dashboard_cache()
         
         status_text = "confirmed" if new_status == 1 else "unconfirmed"
         
@@ -8038,6 +8733,8 @@ def update_receipt_status():
                 continue
         
         connection.commit()
+        invalidate_pos_items_cache()
+        invalidate_dashboard_cache()
         
         # Prepare response message
         status_text = status.title()
@@ -8061,152 +8758,114 @@ def update_receipt_status():
 
 # Analytics Routes
 @app.route('/analytics')
+@require_role('admin', 'manager')
 def analytics():
     """Main analytics dashboard"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('analytics.html', 
                          employee_name=session.get('employee_name'), 
-                         employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_role=g.employee_role,
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/analytics/sales')
+@require_role('admin', 'manager')
 def analytics_sales():
     """Sales analytics page - Admin and Manager access"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('analytics_sales.html', 
                          employee_name=session.get('employee_name'), 
-                         employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_role=g.employee_role,
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/analytics/items')
+@require_role('admin', 'manager')
 def analytics_items():
     """Item analytics page"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('analytics_items.html',
                          employee_name=session.get('employee_name'),
-                         employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_role=g.employee_role,
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/analytics/stock')
+@require_role('admin', 'manager')
 def analytics_stock():
     """Stock analytics overview page"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('analytics_stock.html',
                          employee_name=session.get('employee_name'),
-                         employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_role=g.employee_role,
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/analytics/stock/inventory')
+@require_role('admin', 'manager')
 def analytics_stock_inventory():
     """Stock inventory management page"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('analytics_stock_inventory.html',
                          employee_name=session.get('employee_name'),
-                         employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_role=g.employee_role,
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/analytics/stock/charts')
+@require_role('admin', 'manager')
 def analytics_stock_charts():
     """Stock charts analytics page"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('analytics_stock_charts.html',
                          employee_name=session.get('employee_name'),
-                         employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_role=g.employee_role,
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/analytics/stock/reports')
+@require_role('admin', 'manager')
 def analytics_stock_reports():
     """Stock reports analytics page"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('analytics_stock_reports.html',
                          employee_name=session.get('employee_name'),
-                         employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_role=g.employee_role,
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/analytics/stock/recommendations')
+@require_role('admin', 'manager')
 def analytics_stock_recommendations():
     """Stock recommendations analytics page"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('analytics_stock_recommendations.html',
                          employee_name=session.get('employee_name'),
-                         employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_role=g.employee_role,
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/analytics/employees')
+@require_role('admin', 'manager')
 def analytics_employees():
     """Employee analytics page"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('analytics_employees.html',
                          employee_name=session.get('employee_name'),
-                         employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_role=g.employee_role,
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/analytics/periods')
+@require_role('admin', 'manager')
 def analytics_periods():
     """Period analytics page"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     return render_template('analytics_periods.html',
                          employee_name=session.get('employee_name'),
-                         employee_role=session.get('employee_role'),
-                         employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings)
+                         employee_role=g.employee_role,
+                         employee_profile_photo=employee_profile_photo)
 
 @app.route('/api/analytics/items', methods=['POST'])
+@require_api_role('admin', 'manager')
 def api_analytics_items():
     """API endpoint for item analytics data"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     try:
         data = request.get_json()
         data_type = data.get('dataType', 'general')  # 'general' or 'verified'
         filter_type = data.get('filterType', 'single')
         
-        connection = get_db_connection()
-        if not connection:
-            return jsonify({'success': False, 'message': 'Database connection failed'})
-        
-        cursor = connection.cursor()
-        
         # Build WHERE clause based on data type and filter
         where_conditions = []
         params = []
@@ -8217,18 +8876,13 @@ def api_analytics_items():
         # 'general' includes all statuses (pending, confirmed, cancelled)
         
         # Date filter
-        if filter_type == 'single' and data.get('singleDate'):
-            where_conditions.append("DATE(s.sale_date) = %s")
-            params.append(data['singleDate'])
-        elif filter_type == 'range' and data.get('fromDate') and data.get('toDate'):
-            where_conditions.append("DATE(s.sale_date) BETWEEN %s AND %s")
-            params.extend([data['fromDate'], data['toDate']])
-        elif filter_type == 'month' and data.get('month'):
-            where_conditions.append("DATE_FORMAT(s.sale_date, '%%Y-%%m') = %s")
-            params.append(data['month'])
-        elif filter_type == 'year' and data.get('year'):
-            where_conditions.append("YEAR(s.sale_date) = %s")
-            params.append(data['year'])
+        try:
+            date_params = analytics_date_params(data, filter_type)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid date filter'}), 400
+        if date_params:
+            where_conditions.append(ANALYTICS_DATE_CONDITION)
+            params.extend(date_params)
         
         where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
         
@@ -8249,27 +8903,17 @@ def api_analytics_items():
             {where_clause}
         """
         
-        cursor.execute(summary_query, params)
-        summary_result = cursor.fetchone()
-        
-        summary = {
-            'totalTransactions': summary_result[0] or 0,
-            'totalItemsSold': summary_result[1] or 0,
-            'totalRevenue': float(summary_result[2] or 0),
-            'avgItemsPerSale': float(summary_result[3] or 0)
-        }
-        
         # Get quantity sold by item with peak time and best selling employee
         # For subqueries, we need to handle parameters differently
         # Build the main query first
         quantity_query = f"""
             SELECT 
-                si.item_name,
+                i.name,
                 SUM(si.quantity) as total_quantity,
                 (SELECT HOUR(s2.sale_date) 
                  FROM sales s2 
                  JOIN sales_items si2 ON s2.id = si2.sale_id 
-                 WHERE si2.item_name = si.item_name
+                 WHERE si2.item_id = si.item_id
                  {(' AND ' + ' AND '.join(where_conditions)) if where_conditions else ''}
                  GROUP BY HOUR(s2.sale_date) 
                  ORDER BY COUNT(*) DESC 
@@ -8277,15 +8921,16 @@ def api_analytics_items():
                 (SELECT s3.employee_name 
                  FROM sales s3 
                  JOIN sales_items si3 ON s3.id = si3.sale_id 
-                 WHERE si3.item_name = si.item_name
+                 WHERE si3.item_id = si.item_id
                  {(' AND ' + ' AND '.join(where_conditions)) if where_conditions else ''}
                  GROUP BY s3.employee_name 
                  ORDER BY SUM(si3.quantity) DESC 
                  LIMIT 1) as best_employee
             FROM sales s
             JOIN sales_items si ON s.id = si.sale_id
+            JOIN items i ON si.item_id = i.id
             {where_clause}
-            GROUP BY si.item_name
+            GROUP BY si.item_id, i.name
             ORDER BY total_quantity DESC
         """
         
@@ -8299,50 +8944,20 @@ def api_analytics_items():
         # Combine main query params with subquery params
         all_params = params + subquery_params
         
-        cursor.execute(quantity_query, all_params)
-        quantity_results = cursor.fetchall()
-        quantity_sold = []
-        for row in quantity_results:
-            item_data = {
-                'name': row[0], 
-                'quantity': row[1],
-                'peakTime': f"{row[2] or 0}:00" if row[2] is not None else "N/A",
-                'bestEmployee': row[3] or "N/A"
-            }
-            quantity_sold.append(item_data)
-        
         # Get peak sales times (hour of day analysis)
         peak_query = f"""
             SELECT 
-                si.item_name,
+                i.name,
                 HOUR(s.sale_date) as hour_of_day,
                 COUNT(*) as sales_count
             FROM sales s
             JOIN sales_items si ON s.id = si.sale_id
+            JOIN items i ON si.item_id = i.id
             {where_clause}
-            GROUP BY si.item_name, HOUR(s.sale_date)
-            ORDER BY si.item_name, sales_count DESC
+            GROUP BY si.item_id, i.name, HOUR(s.sale_date)
+            ORDER BY i.name, sales_count DESC
         """
         
-        cursor.execute(peak_query, params)
-        peak_results = cursor.fetchall()
-        
-        # Process peak sales data
-        peak_sales = {}
-        for row in peak_results:
-            item_name = row[0]
-            hour = row[1]
-            count = row[2]
-            
-            if item_name not in peak_sales:
-                peak_sales[item_name] = {'peakTime': f"{hour}:00", 'sales': count}
-            elif count > peak_sales[item_name]['sales']:
-                peak_sales[item_name] = {'peakTime': f"{hour}:00", 'sales': count}
-        
-        peak_sales_list = [{'name': name, 'peakTime': data['peakTime'], 'sales': data['sales']} 
-                          for name, data in peak_sales.items()]
-        peak_sales_list.sort(key=lambda x: x['sales'], reverse=True)
-        
         # Get top selling employees
         employees_query = f"""
             SELECT 
@@ -8357,30 +8972,89 @@ def api_analytics_items():
             LIMIT 10
         """
         
-        cursor.execute(employees_query, params)
-        employee_results = cursor.fetchall()
-        top_employees = [{'name': row[0], 'sales': row[2]} for row in employee_results]
-        
         # Get popular item pairs (items sold together in same transaction)
         pairs_query = f"""
             SELECT 
-                si1.item_name as item1,
-                si2.item_name as item2,
+                i1.name as item1,
+                i2.name as item2,
                 COUNT(*) as pair_count
             FROM sales s
             JOIN sales_items si1 ON s.id = si1.sale_id
             JOIN sales_items si2 ON s.id = si2.sale_id
-            WHERE si1.item_name < si2.item_name
+            JOIN items i1 ON si1.item_id = i1.id
+            JOIN items i2 ON si2.item_id = i2.id
+            WHERE si1.item_id < si2.item_id
             {(' AND ' + ' AND '.join(where_conditions)) if where_conditions else ''}
-            GROUP BY si1.item_name, si2.item_name
+            GROUP BY si1.item_id, si2.item_id, i1.name, i2.name
             HAVING pair_count > 1
             ORDER BY pair_count DESC
             LIMIT 10
         """
         
-        cursor.execute(pairs_query, params)
-        pairs_results = cursor.fetchall()
-        item_pairs = [{'item1': row[0], 'item2': row[1], 'count': row[2]} for row in pairs_results]
+        summary_result = fetch_query_rows(summary_query, params)[0]
+        summary = {
+            'totalTransactions': summary_result[0] or 0,
+            'totalItemsSold': summary_result[1] or 0,
+            'totalRevenue': float(summary_result[2] or 0),
+            'avgItemsPerSale': float(summary_result[3] or 0)
+        }
+        
+        # Skip queries that cannot return rows for the period: nothing matches
+        # without transactions, and a pair needs to appear in at least two sales
+        queries = {}
+        if summary['totalTransactions'] > 0:
+            queries['quantity'] = (quantity_query, all_params)
+            queries['peak'] = (peak_query, params)
+            queries['employees'] = (employees_query, params)
+        if summary['totalTransactions'] > 1:
+            queries['pairs'] = (pairs_query, params)
+        
+        if filter_type != 'single' and summary['totalTransactions'] > 0:
+            # Line chart for multiple days - get daily totals
+            daily_query = f"""
+                SELECT 
+                    DATE_FORMAT(DATE(s.sale_date), '%%m/%%d') as day_label,
+                    SUM(si.quantity) as daily_quantity
+                FROM sales s
+                JOIN sales_items si ON s.id = si.sale_id
+                {where_clause}
+                GROUP BY DATE(s.sale_date)
+                ORDER BY DATE(s.sale_date)
+            """
+            queries['daily'] = (daily_query, params)
+        
+        # The remaining queries are independent of each other, so run them in parallel
+        results = run_queries_concurrently(queries)
+        
+        quantity_sold = []
+        for row in results.get('quantity', ()):
+            item_data = {
+                'name': row[0], 
+                'quantity': row[1],
+                'peakTime': f"{row[2] or 0}:00" if row[2] is not None else "N/A",
+                'bestEmployee': row[3] or "N/A"
+            }
+            quantity_sold.append(item_data)
+        
+        # Process peak sales data
+        peak_sales = {}
+        for row in results.get('peak', ()):
+            item_name = row[0]
+            hour = row[1]
+            count = row[2]
+            
+            if item_name not in peak_sales:
+                peak_sales[item_name] = {'peakTime': f"{hour}:00", 'sales': count}
+            elif count > peak_sales[item_name]['sales']:
+                peak_sales[item_name] = {'peakTime': f"{hour}:00", 'sales': count}
+        
+        peak_sales_list = [{'name': name, 'peakTime': data['peakTime'], 'sales': data['sales']} 
+                          for name, data in peak_sales.items()]
+        peak_sales_list.sort(key=lambda x: x['sales'], reverse=True)
+        
+        top_employees = [{'name': row[0], 'sales': row[2]} for row in results.get('employees', ())]
+        
+        item_pairs = [dict(zip(ITEM_PAIR_KEYS, row)) for row in results.get('pairs', ())]
         
         # Get top items (same as quantity sold but formatted for top items section)
         top_items = quantity_sold[:5]
@@ -8393,28 +9067,12 @@ def api_analytics_items():
                 'data': [item['quantity'] for item in quantity_sold[:15]]
             }
         else:
-            # Line chart for multiple days - get daily totals
-            daily_query = f"""
-                SELECT 
-                    DATE(s.sale_date) as sale_date,
-                    SUM(si.quantity) as daily_quantity
-                FROM sales s
-                JOIN sales_items si ON s.id = si.sale_id
-                {where_clause}
-                GROUP BY DATE(s.sale_date)
-                ORDER BY sale_date
-            """
-            
-            cursor.execute(daily_query, params)
-            daily_results = cursor.fetchall()
-            
+            daily_results = results.get('daily', ())
             chart_data = {
-                'labels': [row[0].strftime('%m/%d') for row in daily_results],
+                'labels': [row[0] for row in daily_results],
                 'data': [row[1] for row in daily_results]
             }
         
-        connection.close()
-        
         analytics_data = {
             'summary': summary,
             'quantitySold': quantity_sold,
@@ -8434,11 +9092,9 @@ def api_analytics_items():
         print(f"Error in item analytics API: {e}")
         return jsonify({'success': False, 'message': 'Error processing analytics data'}), 500
 @app.route('/api/analytics/stock', methods=['POST'])
+@require_api_role('admin', 'manager')
 def api_analytics_stock():
     """API endpoint for stock analytics data"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     try:
         data = request.get_json()
         data_type = data.get('dataType', 'general')
@@ -8474,8 +9130,8 @@ def api_analytics_stock():
                 conditions.append(f"st.created_at >= '{start_date} 00:00:00' AND st.created_at <= '{end_date} 23:59:59'")
             elif date_filter_type == 'month' and month:
                 year, month_num = month.split('-')
-                conditions.append(f"YEAR(s.sale_date) = {year} AND MONTH(s.sale_date) = {month_num}")
-                conditions.append(f"YEAR(st.created_at) = {year} AND MONTH(st.created_at) = {month_num}")
+                conditions.append(f"s.sale_date >= '{year}-{month_num}-01' AND s.sale_date < '{year}-{month_num}-01' + INTERVAL 1 MONTH")
+                conditions.append(f"st.created_at >= '{year}-{month_num}-01' AND st.created_at < '{year}-{month_num}-01' + INTERVAL 1 MONTH")
             elif date_filter_type == 'preset' and period:
                 today = datetime.now().date()
                 if period == 'today':
@@ -8512,8 +9168,8 @@ def api_analytics_stock():
                     conditions.append(f"DATE(st.created_at) >= '{first_of_year}'")
                 elif period == 'lastYear':
                     last_year = today.year - 1
-                    conditions.append(f"YEAR(s.sale_date) = {last_year}")
-                    conditions.append(f"YEAR(st.created_at) = {last_year}")
+                    conditions.append(f"s.sale_date >= '{last_year}-01-01' AND s.sale_date < '{today.year}-01-01'")
+                    conditions.append(f"st.created_at >= '{last_year}-01-01' AND st.created_at < '{today.year}-01-01'")
             
             return conditions
         
@@ -8525,8 +9181,8 @@ def api_analytics_stock():
         if len(date_conditions) == 0:
             current_month = datetime.now().strftime('%Y-%m')
             year, month_num = current_month.split('-')
-            sales_date_condition = f"YEAR(s.sale_date) = {year} AND MONTH(s.sale_date) = {month_num}"
-            stock_date_condition = f"YEAR(st.created_at) = {year} AND MONTH(st.created_at) = {month_num}"
+            sales_date_condition = f"s.sale_date >= '{year}-{month_num}-01' AND s.sale_date < '{year}-{month_num}-01' + INTERVAL 1 MONTH"
+            stock_date_condition = f"st.created_at >= '{year}-{month_num}-01' AND st.created_at < '{year}-{month_num}-01' + INTERVAL 1 MONTH"
             print(f"Using default current month: {current_month}")
         else:
             sales_date_condition = date_conditions[0]
@@ -8728,13 +9384,13 @@ def api_analytics_stock():
         # Get real usage trends from sales data
         usage_trends_query = f"""
             SELECT 
-                DATE(s.sale_date) as date,
+                DATE_FORMAT(DATE(s.sale_date), '%m/%d') as label,
                 SUM(si.quantity) as total_usage
             FROM sales s
             JOIN sales_items si ON s.id = si.sale_id
             WHERE {sales_date_condition}
             GROUP BY DATE(s.sale_date)
-            ORDER BY date ASC
+            ORDER BY DATE(s.sale_date) ASC
         """
         
         cursor.execute(usage_trends_query)
@@ -8742,7 +9398,7 @@ def api_analytics_stock():
         
         # Process usage trends data
         usage_trends = {
-            'labels': [row[0].strftime('%m/%d') for row in usage_trends_results],
+            'labels': [row[0] for row in usage_trends_results],
             'data': [int(row[1]) for row in usage_trends_results]
         }
         
@@ -8807,7 +9463,7 @@ def api_analytics_stock():
         # Stock In vs Stock Out Analysis with sales revenue for viability assessment
         stock_in_out_query = f"""
             SELECT 
-                DATE(s.sale_date) as date,
+                DATE_FORMAT(DATE(s.sale_date), '%m/%d') as label,
                 SUM(si.quantity) as stock_out,
                 SUM(si.total_price) as daily_revenue,
                 COUNT(DISTINCT si.item_name) as items_sold
@@ -8815,7 +9471,7 @@ def api_analytics_stock():
             JOIN sales_items si ON s.id = si.sale_id
             WHERE {sales_date_condition}
             GROUP BY DATE(s.sale_date)
-            ORDER BY date ASC
+            ORDER BY DATE(s.sale_date) ASC
         """
         
         cursor.execute(stock_in_out_query)
@@ -8823,7 +9479,7 @@ def api_analytics_stock():
         
         # Process stock out data with revenue information
         stock_out_data = [int(row[1]) for row in stock_in_out_results]
-        stock_out_labels = [row[0].strftime('%m/%d') for row in stock_in_out_results]
+        stock_out_labels = [row[0] for row in stock_in_out_results]
         daily_revenue = [float(row[2]) for row in stock_in_out_results]
         items_sold = [int(row[3]) for row in stock_in_out_results]
         
@@ -8896,11 +9552,9 @@ def api_analytics_stock():
         return jsonify({'success': False, 'message': 'Error processing stock analytics data'}), 500
 
 @app.route('/api/stock/mark-alerts-read', methods=['POST'])
+@require_api_role('admin', 'manager')
 def mark_stock_alerts_read():
     """Mark all stock alerts as read"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     try:
         # In a real implementation, you would update a database table to mark alerts as read
         # For now, we'll just return success
@@ -8909,11 +9563,9 @@ def mark_stock_alerts_read():
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/api/stock/auto-reorder', methods=['POST'])
+@require_api_role('admin', 'manager')
 def auto_reorder_stock():
     """Perform automatic reordering based on recommendations"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     try:
         connection = get_db_connection()
         if not connection:
@@ -8959,11 +9611,10 @@ def auto_reorder_stock():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 @app.route('/api/analytics/periods', methods=['POST'])
+@require_api_role('admin', 'manager')
 def api_analytics_periods():
     """API endpoint for period analytics data"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
+    connection = None
     try:
         data = request.get_json()
         data_type = data.get('dataType', 'general')  # 'general' or 'verified'
@@ -8979,27 +9630,13 @@ def api_analytics_periods():
         where_conditions = [status_condition]
         params = []
         
-        if filter_type == 'single':
-            single_date = data.get('singleDate')
-            if single_date:
-                where_conditions.append("DATE(s.sale_date) = %s")
-                params.append(single_date)
-        elif filter_type == 'range':
-            from_date = data.get('fromDate')
-            to_date = data.get('toDate')
-            if from_date and to_date:
-                where_conditions.append("DATE(s.sale_date) BETWEEN %s AND %s")
-                params.extend([from_date, to_date])
-        elif filter_type == 'month':
-            month = data.get('month')
-            if month:
-                where_conditions.append("DATE_FORMAT(s.sale_date, '%%Y-%%m') = %s")
-                params.append(month)
-        elif filter_type == 'year':
-            year = data.get('year')
-            if year:
-                where_conditions.append("YEAR(s.sale_date) = %s")
-                params.append(year)
+        try:
+            date_params = analytics_date_params(data, filter_type)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid date filter'}), 400
+        if date_params:
+            where_conditions.append(ANALYTICS_DATE_CONDITION)
+            params.extend(date_params)
         
         where_clause = " AND ".join(where_conditions)
         
@@ -9013,7 +9650,8 @@ def api_analytics_periods():
                 COALESCE(SUM(s.total_amount), 0) as total_revenue,
                 COALESCE(SUM(si.quantity), 0) as total_items_sold,
                 COUNT(DISTINCT s.employee_id) as active_employees,
-                COALESCE(AVG(s.total_amount), 0) as avg_transaction_value
+                COALESCE(AVG(s.total_amount), 0) as avg_transaction_value,
+                COALESCE(AVG(s.total_amount), 0) > 1000 as high_avg_transaction_flag
             FROM sales s
             LEFT JOIN sales_items si ON s.id = si.sale_id
             WHERE {where_clause}
@@ -9029,6 +9667,7 @@ def api_analytics_periods():
             'activeEmployees': summary_result[3] or 0,
             'avgTransactionValue': float(summary_result[4] or 0)
         }
+        high_avg_transaction = bool(summary_result[5])
         
         # All items with comprehensive sales data
         all_items_query = f"""
@@ -9164,10 +9803,11 @@ def api_analytics_periods():
         
         cursor.execute(combinations_query, params)
         combinations_results = cursor.fetchall()
-        best_combinations = [{'item1': row[0], 'item2': row[1], 'count': row[2]} for row in combinations_results]
+        best_combinations = [dict(zip(ITEM_PAIR_KEYS, row)) for row in combinations_results]
         
-        # Most active employees
-        most_active_query = f"""
+        # Per-employee activity, fetched once; the most and least active
+        # lists are the two ends of the same ranking
+        employee_activity_query = f"""
             SELECT 
                 e.full_name,
                 COUNT(s.id) as sales_count,
@@ -9176,41 +9816,28 @@ def api_analytics_periods():
             JOIN employees e ON s.employee_id = e.id
             WHERE {where_clause}
             GROUP BY e.full_name
-            ORDER BY sales_count DESC
-            LIMIT 10
         """
         
-        cursor.execute(most_active_query, params)
-        most_active_results = cursor.fetchall()
-        most_active_employees = [{'name': row[0], 'sales': row[1], 'revenue': float(row[2])} for row in most_active_results]
+        cursor.execute(employee_activity_query, params)
+        employee_activity_results = cursor.fetchall()
         
-        # Least active employees
-        least_active_query = f"""
-            SELECT 
-                e.full_name,
-                COUNT(s.id) as sales_count,
-                COALESCE(SUM(s.total_amount), 0) as total_sales
-            FROM sales s
-            JOIN employees e ON s.employee_id = e.id
-            WHERE {where_clause}
-            GROUP BY e.full_name
-            ORDER BY sales_count ASC
-            LIMIT 10
-        """
+        # Most active employees
+        most_active_results = sorted(employee_activity_results, key=lambda row: row[1], reverse=True)[:10]
+        most_active_employees = [dict(zip(EMPLOYEE_ACTIVITY_KEYS, row)) for row in most_active_results]
         
-        cursor.execute(least_active_query, params)
-        least_active_results = cursor.fetchall()
-        least_active_employees = [{'name': row[0], 'sales': row[1], 'revenue': float(row[2])} for row in least_active_results]
+        # Least active employees
+        least_active_results = sorted(employee_activity_results, key=lambda row: row[1])[:10]
+        least_active_employees = [dict(zip(EMPLOYEE_ACTIVITY_KEYS, row)) for row in least_active_results]
         
         # Peak hour analysis
         peak_hour_query = f"""
             SELECT 
-                HOUR(s.sale_date) as hour,
+                s.sale_hour as hour,
                 COUNT(*) as transaction_count,
                 COALESCE(SUM(s.total_amount), 0) as revenue
             FROM sales s
             WHERE {where_clause}
-            GROUP BY HOUR(s.sale_date)
+            GROUP BY s.sale_hour
             ORDER BY transaction_count DESC
             LIMIT 1
         """
@@ -9246,7 +9873,7 @@ def api_analytics_periods():
         # Performance insights
         performance_insights = []
         if summary['totalTransactions'] > 0:
-            if summary['avgTransactionValue'] > 1000:
+            if high_avg_transaction:
                 performance_insights.append("High average transaction value indicates good upselling")
             if len(most_active_employees) > 0 and len(least_active_employees) > 0:
                 if most_active_employees[0]['sales'] > least_active_employees[0]['sales'] * 2:
@@ -9255,38 +9882,9 @@ def api_analytics_periods():
                 performance_insights.append("Strong item combinations suggest effective cross-selling")
         
         # Chart data
-        chart_data = {'labels': [], 'revenue': []}
-        
-        if filter_type == 'single':
-            # Hourly breakdown for single day
-            hourly_query = f"""
-                SELECT 
-                    HOUR(s.sale_date) as hour,
-                    COALESCE(SUM(s.total_amount), 0) as revenue
-                FROM sales s
-                WHERE {where_clause}
-                GROUP BY HOUR(s.sale_date)
-                ORDER BY hour
-            """
-            cursor.execute(hourly_query, params)
-            hourly_results = cursor.fetchall()
-            chart_data['labels'] = [f"{row[0]}:00" for row in hourly_results]
-            chart_data['revenue'] = [float(row[1]) for row in hourly_results]
-        else:
-            # Daily breakdown for multi-day periods
-            daily_query = f"""
-                SELECT 
-                    DATE(s.sale_date) as date,
-                    COALESCE(SUM(s.total_amount), 0) as revenue
-                FROM sales s
-                WHERE {where_clause}
-                GROUP BY DATE(s.sale_date)
-                ORDER BY date
-            """
-            cursor.execute(daily_query, params)
-            daily_results = cursor.fetchall()
-            chart_data['labels'] = [row[0].strftime('%m/%d') for row in daily_results]
-            chart_data['revenue'] = [float(row[1]) for row in daily_results]
+        with connection.cursor(pymysql.cursors.DictCursor) as chart_cursor:
+            chart_cursor.execute(revenue_chart_query(where_clause, filter_type), params)
+            chart_data = build_revenue_chart(chart_cursor.fetchall())
         
         analytics_data = {
             'summary': summary,
@@ -9301,7 +9899,7 @@ def api_analytics_periods():
             'chartData': chart_data
         }
         
-        return jsonify({
+        return json_response({
             'success': True,
             'analytics': analytics_data
         })
@@ -9316,11 +9914,9 @@ def api_analytics_periods():
             connection.close()
 
 @app.route('/api/analytics/employees', methods=['POST'])
+@require_api_role('admin', 'manager')
 def api_analytics_employees():
     """API endpoint for employee analytics data"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     try:
         data = request.get_json()
         data_type = data.get('dataType', 'general')  # 'general' or 'verified'
@@ -9336,33 +9932,16 @@ def api_analytics_employees():
         where_conditions = [status_condition]
         params = []
         
-        if filter_type == 'single':
-            single_date = data.get('singleDate')
-            if single_date:
-                where_conditions.append("DATE(s.sale_date) = %s")
-                params.append(single_date)
-        elif filter_type == 'range':
-            from_date = data.get('fromDate')
-            to_date = data.get('toDate')
-            if from_date and to_date:
-                where_conditions.append("DATE(s.sale_date) BETWEEN %s AND %s")
-                params.extend([from_date, to_date])
-        elif filter_type == 'month':
-            month = data.get('month')
-            if month:
-                where_conditions.append("DATE_FORMAT(s.sale_date, '%%Y-%%m') = %s")
-                params.append(month)
-        elif filter_type == 'year':
-            year = data.get('year')
-            if year:
-                where_conditions.append("YEAR(s.sale_date) = %s")
-                params.append(year)
+        try:
+            date_params = analytics_date_params(data, filter_type)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid date filter'}), 400
+        if date_params:
+            where_conditions.append(ANALYTICS_DATE_CONDITION)
+            params.extend(date_params)
         
         where_clause = " AND ".join(where_conditions)
         
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         # Summary statistics
         summary_query = f"""
             SELECT 
@@ -9374,104 +9953,73 @@ def api_analytics_employees():
             LEFT JOIN sales s ON e.id = s.employee_id AND {where_clause}
         """
         
-        cursor.execute(summary_query, params)
-        summary_result = cursor.fetchone()
-        
-        summary = {
-            'totalEmployees': summary_result[0] or 0,
-            'activeEmployees': summary_result[1] or 0,
-            'totalTransactions': summary_result[2] or 0,
-            'avgSalesPerEmployee': float(summary_result[3] or 0)
-        }
+        # Per-employee totals in one pass over the daily summary; the four
+        # ranked lists below are different orderings of the same rows
+        if data_type == 'verified':
+            employee_day_conditions = ["eds.status = 'confirmed'"]
+        else:
+            employee_day_conditions = ["eds.status IN ('pending', 'confirmed', 'cancelled')"]
+        if params:
+            employee_day_conditions.append("eds.sale_day >= %s AND eds.sale_day < %s")
+        employee_day_clause = " AND ".join(employee_day_conditions)
         
-        # Top performers (by sales count)
-        top_performers_query = f"""
+        employee_totals_query = f"""
             SELECT 
-                e.full_name,
-                e.role,
-                COUNT(s.id) as sales_count,
-                COALESCE(SUM(s.total_amount), 0) as total_revenue
+                e.full_name as name,
+                e.role as role,
+                CAST(COALESCE(SUM(eds.tx_count), 0) AS SIGNED) as sales,
+                COALESCE(SUM(eds.revenue), 0) as revenue
             FROM employees e
-            LEFT JOIN sales s ON e.id = s.employee_id AND {where_clause}
+            LEFT JOIN {employee_day_sales_source()} eds ON e.id = eds.employee_id AND {employee_day_clause}
             WHERE e.status = 'active'
             GROUP BY e.id, e.full_name, e.role
-            ORDER BY sales_count DESC
-            LIMIT 10
         """
         
-        cursor.execute(top_performers_query, params)
-        top_performers_results = cursor.fetchall()
-        top_performers = [{'name': row[0], 'role': row[1], 'sales': row[2], 'revenue': float(row[3])} for row in top_performers_results]
-        
-        # Sales leaders (by revenue)
-        sales_leaders_query = f"""
+        # Employee roles distribution
+        roles_query = f"""
             SELECT 
-                e.full_name,
-                e.role,
-                COUNT(s.id) as sales_count,
-                COALESCE(SUM(s.total_amount), 0) as total_revenue
+                e.role as role,
+                COUNT(DISTINCT e.id) as count
             FROM employees e
-            LEFT JOIN sales s ON e.id = s.employee_id AND {where_clause}
             WHERE e.status = 'active'
-            GROUP BY e.id, e.full_name, e.role
-            ORDER BY total_revenue DESC
-            LIMIT 10
+            GROUP BY e.role
+            ORDER BY count DESC
         """
         
-        cursor.execute(sales_leaders_query, params)
-        sales_leaders_results = cursor.fetchall()
-        sales_leaders = [{'name': row[0], 'role': row[1], 'sales': row[2], 'revenue': float(row[3])} for row in sales_leaders_results]
+        # The lookups are independent of each other, so run them in parallel.
+        # Column aliases match the response keys, so list rows are returned as-is.
+        results = run_queries_concurrently({
+            'summary': (summary_query, params),
+            'chart': (revenue_chart_query(where_clause, filter_type), params),
+            'employee_totals': (employee_totals_query, params),
+            'roles': (roles_query, None)
+        }, pymysql.cursors.DictCursor)
         
-        # Most active employees
-        most_active_query = f"""
-            SELECT 
-                e.full_name,
-                COUNT(s.id) as sales_count,
-                COALESCE(SUM(s.total_amount), 0) as total_revenue
-            FROM employees e
-            LEFT JOIN sales s ON e.id = s.employee_id AND {where_clause}
-            WHERE e.status = 'active'
-            GROUP BY e.id, e.full_name
-            ORDER BY sales_count DESC
-            LIMIT 10
-        """
+        summary_result = results['summary'][0]
+        summary = {
+            'totalEmployees': summary_result['total_employees'] or 0,
+            'activeEmployees': summary_result['active_employees'] or 0,
+            'totalTransactions': summary_result['total_transactions'] or 0,
+            'avgSalesPerEmployee': float(summary_result['avg_sales_per_employee'] or 0)
+        }
         
-        cursor.execute(most_active_query, params)
-        most_active_results = cursor.fetchall()
-        most_active_employees = [{'name': row[0], 'sales': row[1], 'revenue': float(row[2])} for row in most_active_results]
+        employee_totals = results['employee_totals']
         
-        # Least active employees
-        least_active_query = f"""
-            SELECT 
-                e.full_name,
-                COUNT(s.id) as sales_count,
-                COALESCE(SUM(s.total_amount), 0) as total_revenue
-            FROM employees e
-            LEFT JOIN sales s ON e.id = s.employee_id AND {where_clause}
-            WHERE e.status = 'active'
-            GROUP BY e.id, e.full_name
-            ORDER BY sales_count ASC
-            LIMIT 10
-        """
+        # Top performers (by sales count)
+        top_performers = sorted(employee_totals, key=lambda row: row['sales'], reverse=True)[:10]
         
-        cursor.execute(least_active_query, params)
-        least_active_results = cursor.fetchall()
-        least_active_employees = [{'name': row[0], 'sales': row[1], 'revenue': float(row[2])} for row in least_active_results]
+        # Sales leaders (by revenue)
+        sales_leaders = sorted(employee_totals, key=lambda row: row['revenue'], reverse=True)[:10]
         
-        # Employee roles distribution
-        roles_query = f"""
-            SELECT 
-                e.role,
-                COUNT(DISTINCT e.id) as role_count
-            FROM employees e
-            WHERE e.status = 'active'
-            GROUP BY e.role
-            ORDER BY role_count DESC
-        """
+        # Most active employees
+        most_active_employees = [{'name': row['name'], 'sales': row['sales'], 'revenue': row['revenue']} for row in top_performers]
         
-        cursor.execute(roles_query)
-        roles_results = cursor.fetchall()
-        employee_roles = [{'role': row[0], 'count': row[1]} for row in roles_results]
+        # Least active employees
+        least_active_results = sorted(employee_totals, key=lambda row: row['sales'])[:10]
+        least_active_employees = [{'name': row['name'], 'sales': row['sales'], 'revenue': row['revenue']} for row in least_active_results]
+        
+        # Employee roles distribution
+        employee_roles = results['roles']
         
         # Performance insights
         performance_insights = []
@@ -9492,38 +10040,7 @@ def api_analytics_employees():
                 performance_trends.append("Above-average sales performance across the team")
         
         # Chart data
-        chart_data = {'labels': [], 'revenue': []}
-        
-        if filter_type == 'single':
-            # Hourly breakdown for single day
-            hourly_query = f"""
-                SELECT 
-                    HOUR(s.sale_date) as hour,
-                    COALESCE(SUM(s.total_amount), 0) as revenue
-                FROM sales s
-                WHERE {where_clause}
-                GROUP BY HOUR(s.sale_date)
-                ORDER BY hour
-            """
-            cursor.execute(hourly_query, params)
-            hourly_results = cursor.fetchall()
-            chart_data['labels'] = [f"{row[0]}:00" for row in hourly_results]
-            chart_data['revenue'] = [float(row[1]) for row in hourly_results]
-        else:
-            # Daily breakdown for multi-day periods
-            daily_query = f"""
-                SELECT 
-                    DATE(s.sale_date) as date,
-                    COALESCE(SUM(s.total_amount), 0) as revenue
-                FROM sales s
-                WHERE {where_clause}
-                GROUP BY DATE(s.sale_date)
-                ORDER BY date
-            """
-            cursor.execute(daily_query, params)
-            daily_results = cursor.fetchall()
-            chart_data['labels'] = [row[0].strftime('%m/%d') for row in daily_results]
-            chart_data['revenue'] = [float(row[1]) for row in daily_results]
+        chart_data = build_revenue_chart(results['chart'])
         
         analytics_data = {
             'summary': summary,
@@ -9537,7 +10054,7 @@ def api_analytics_employees():
             'chartData': chart_data
         }
         
-        return jsonify({
+        return json_response({
             'success': True,
             'analytics': analytics_data
         })
@@ -9547,16 +10064,11 @@ def api_analytics_employees():
             'success': False,
             'message': str(e)
         })
-    finally:
-        if connection:
-            connection.close()
 
 @app.route('/api/analytics/sales', methods=['POST'])
+@require_api_role('admin', 'manager')
 def api_analytics_sales():
     """API endpoint for sales analytics data"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     try:
         data = request.get_json()
         data_type = data.get('dataType', 'general')  # 'general' or 'verified'
@@ -9572,33 +10084,16 @@ def api_analytics_sales():
         where_conditions = [status_condition]
         params = []
         
-        if filter_type == 'single':
-            single_date = data.get('singleDate')
-            if single_date:
-                where_conditions.append("DATE(s.sale_date) = %s")
-                params.append(single_date)
-        elif filter_type == 'range':
-            from_date = data.get('fromDate')
-            to_date = data.get('toDate')
-            if from_date and to_date:
-                where_conditions.append("DATE(s.sale_date) BETWEEN %s AND %s")
-                params.extend([from_date, to_date])
-        elif filter_type == 'month':
-            month = data.get('month')
-            if month:
-                where_conditions.append("DATE_FORMAT(s.sale_date, '%%Y-%%m') = %s")
-                params.append(month)
-        elif filter_type == 'year':
-            year = data.get('year')
-            if year:
-                where_conditions.append("YEAR(s.sale_date) = %s")
-                params.append(year)
+        try:
+            date_params = analytics_date_params(data, filter_type)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid date filter'}), 400
+        if date_params:
+            where_conditions.append(ANALYTICS_DATE_CONDITION)
+            params.extend(date_params)
         
         where_clause = " AND ".join(where_conditions)
         
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
         # Summary statistics
         summary_query = f"""
             SELECT 
@@ -9611,16 +10106,6 @@ def api_analytics_sales():
             WHERE {where_clause}
         """
         
-        cursor.execute(summary_query, params)
-        summary_result = cursor.fetchone()
-        
-        summary = {
-            'totalTransactions': summary_result[0] or 0,
-            'totalRevenue': float(summary_result[1] or 0),
-            'avgOrderValue': float(summary_result[2] or 0),
-            'totalItemsSold': summary_result[3] or 0
-        }
-        
         # Peak sale period analysis
         peak_period_query = f"""
             SELECT 
@@ -9634,88 +10119,69 @@ def api_analytics_sales():
             LIMIT 1
         """
         
-        cursor.execute(peak_period_query, params)
-        peak_result = cursor.fetchone()
-        peak_period = "No data available"
-        if peak_result:
-            hour = peak_result[0]
-            start_time = f"{hour:02d}:00"
-            end_time = f"{hour+1:02d}:00"
-            peak_period = f"{start_time} - {end_time}"
-        
         # Items with revenue and employee who sold them
         items_with_employee_query = f"""
             SELECT 
-                i.name,
-                i.category,
-                SUM(si.quantity) as total_quantity,
-                COALESCE(SUM(si.total_price), 0) as total_revenue,
-                e.full_name as employee_name
+                i.name as name,
+                i.category as category,
+                SUM(si.quantity) as quantity,
+                COALESCE(SUM(si.total_price), 0) as revenue,
+                e.full_name as employee
             FROM sales s
             JOIN sales_items si ON s.id = si.sale_id
             JOIN items i ON si.item_id = i.id
             JOIN employees e ON s.employee_id = e.id
             WHERE {where_clause}
             GROUP BY i.id, i.name, i.category, e.full_name
-            ORDER BY total_revenue DESC
+            ORDER BY revenue DESC
             LIMIT 20
         """
         
-        cursor.execute(items_with_employee_query, params)
-        items_with_employee_results = cursor.fetchall()
-        items_with_employee = [{'name': row[0], 'category': row[1], 'quantity': row[2], 'revenue': float(row[3]), 'employee': row[4]} for row in items_with_employee_results]
-        
         # Employee revenue analysis
         employee_revenue_query = f"""
             SELECT 
-                e.full_name as employee_name,
-                e.role as employee_role,
-                COUNT(DISTINCT s.id) as total_transactions,
-                COALESCE(SUM(s.total_amount), 0) as total_revenue
+                e.full_name as name,
+                e.role as role,
+                COUNT(DISTINCT s.id) as transactions,
+                COALESCE(SUM(s.total_amount), 0) as revenue
             FROM sales s
             JOIN employees e ON s.employee_id = e.id
             WHERE {where_clause}
             GROUP BY e.id, e.full_name, e.role
-            ORDER BY total_revenue DESC
+            ORDER BY revenue DESC
         """
         
-        cursor.execute(employee_revenue_query, params)
-        employee_revenue_results = cursor.fetchall()
-        employee_revenue = [{'name': row[0], 'role': row[1], 'transactions': row[2], 'revenue': float(row[3])} for row in employee_revenue_results]
+        # The lookups are independent of each other, so run them in parallel.
+        # Column aliases match the response keys, so list rows are returned as-is.
+        results = run_queries_concurrently({
+            'summary': (summary_query, params),
+            'chart': (revenue_chart_query(where_clause, filter_type), params),
+            'peak_period': (peak_period_query, params),
+            'items_with_employee': (items_with_employee_query, params),
+            'employee_revenue': (employee_revenue_query, params)
+        }, pymysql.cursors.DictCursor)
+        
+        summary_result = results['summary'][0]
+        summary = {
+            'totalTransactions': summary_result['total_transactions'] or 0,
+            'totalRevenue': float(summary_result['total_revenue'] or 0),
+            'avgOrderValue': float(summary_result['avg_order_value'] or 0),
+            'totalItemsSold': summary_result['total_items_sold'] or 0
+        }
         
-        # Chart data
-        chart_data = {'labels': [], 'revenue': []}
+        peak_period = "No data available"
+        if results['peak_period']:
+            hour = results['peak_period'][0]['hour']
+            start_time = f"{hour:02d}:00"
+            end_time = f"{hour+1:02d}:00"
+            peak_period = f"{start_time} - {end_time}"
         
-        if filter_type == 'single':
-            # Hourly breakdown for single day
-            hourly_query = f"""
-                SELECT 
-                    HOUR(s.sale_date) as hour,
-                    COALESCE(SUM(s.total_amount), 0) as revenue
-                FROM sales s
-                WHERE {where_clause}
-                GROUP BY HOUR(s.sale_date)
-                ORDER BY hour
-            """
-            cursor.execute(hourly_query, params)
-            hourly_results = cursor.fetchall()
-            chart_data['labels'] = [f"{row[0]}:00" for row in hourly_results]
-            chart_data['revenue'] = [float(row[1]) for row in hourly_results]
-        else:
-            # Daily breakdown for multi-day periods
-            daily_query = f"""
-                SELECT 
-                    DATE(s.sale_date) as date,
-                    COALESCE(SUM(s.total_amount), 0) as revenue
-                FROM sales s
-                WHERE {where_clause}
-                GROUP BY DATE(s.sale_date)
-                ORDER BY date
-            """
-            cursor.execute(daily_query, params)
-            daily_results = cursor.fetchall()
-            chart_data['labels'] = [row[0].strftime('%m/%d') for row in daily_results]
-            chart_data['revenue'] = [float(row[1]) for row in daily_results]
+        items_with_employee = results['items_with_employee']
+        
+        employee_revenue = results['employee_revenue']
+        
+        # Chart data
+        chart_data = build_revenue_chart(results['chart'])
         
         analytics_data = {
             'summary': summary,
@@ -9725,7 +10191,7 @@ def api_analytics_sales():
             'chartData': chart_data
         }
         
-        return jsonify({
+        return json_response({
             'success': True,
             'analytics': analytics_data
         })
@@ -9735,73 +10201,67 @@ def api_analytics_sales():
             'success': False,
             'message': str(e)
         })
-    finally:
-        if connection:
-            connection.close()
+
 @app.route('/receipts')
+@require_role('admin', 'manager')
 def receipts():
     """Receipts management page"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    
     try:
         connection = get_db_connection()
         if not connection:
             return render_template('receipts.html', receipts=[], error="Database connection failed")
         
-        cursor = connection.cursor()
-        
-        # Fetch all sales with employee information
-        cursor.execute("""
-            SELECT s.id, s.receipt_number, s.employee_name, s.subtotal, s.tax_amount, 
-                   s.total_amount, s.sale_date, s.created_at, s.status,
-                   COUNT(si.id) as item_count
-            FROM sales s
-            LEFT JOIN sales_items si ON s.id = si.sale_id
-            GROUP BY s.id, s.receipt_number, s.employee_name, s.subtotal, s.tax_amount, 
-                     s.total_amount, s.sale_date, s.created_at, s.status
-            ORDER BY 
-                CASE s.status 
-                    WHEN 'pending' THEN 1 
-                    WHEN 'cancelled' THEN 2 
-                    WHEN 'confirmed' THEN 3 
-                    ELSE 4 
-                END,
-                s.created_at DESC
-        """)
+        # Resolved before streaming starts, while no result set is pending
+        item_count_column = sale_item_count_column()
         
-        receipts = cursor.fetchall()
+        # Stream rows with an unbuffered cursor so the result set is never
+        # held in memory twice (raw rows plus the template dictionaries).
+        # Closing it drains any unread rows, so the shared connection is
+        # usable again even if building a row fails (e.g. for the error page).
+        with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+            # Fetch all sales with employee information
+            cursor.execute(f"""
+                SELECT s.id, s.receipt_number, s.employee_name, s.subtotal, s.tax_amount, 
+                       s.total_amount, s.sale_date, s.created_at, s.status,
+                       {item_count_column}
+                FROM sales s
+                ORDER BY s.status_sort, s.created_at DESC
+            """)
+            
+            # Convert to list of dictionaries for easier template handling
+            receipts_list = []
+            
+            for receipt in cursor:
+                receipt_data = {
+                    'id': receipt[0],
+                    'receipt_number': receipt[1],
+                    'employee_name': receipt[2],
+                    'subtotal': float(receipt[3]),
+                    'tax_amount': float(receipt[4]),
+                    'total_amount': float(receipt[5]),
+                    'sale_date': receipt[6],
+                    'created_at': receipt[7],
+                    'status': receipt[8] or 'pending',  # Default to pending if null
+                    'item_count': receipt[9]
+                }
+                receipts_list.append(receipt_data)
         
-        # Convert to list of dictionaries for easier template handling
-        receipts_list = []
-        today_receipts_count = 0
-        total_revenue = 0.0
+        # Calculate statistics in SQL rather than summing the rows in Python
         today = datetime.now().date()
-        
-        for receipt in receipts:
-            receipt_data = {
-                'id': receipt[0],
-                'receipt_number': receipt[1],
-                'employee_name': receipt[2],
-                'subtotal': float(receipt[3]),
-                'tax_amount': float(receipt[4]),
-                'total_amount': float(receipt[5]),
-                'sale_date': receipt[6],
-                'created_at': receipt[7],
-                'status': receipt[8] or 'pending',  # Default to pending if null
-                'item_count': receipt[9]
-            }
-            receipts_list.append(receipt_data)
-            
-            # Calculate statistics
-            total_revenue += receipt_data['total_amount']
-            if receipt[6] and receipt[6].date() == today:
-                today_receipts_count += 1
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT 
+                    COALESCE(SUM(total_amount), 0),
+                    COALESCE(SUM(sale_date >= %s AND sale_date < %s), 0)
+                FROM sales
+            """, (today, today + timedelta(days=1)))
+            total_revenue, today_receipts_count = cursor.fetchone()
+        total_revenue = float(total_revenue)
+        today_receipts_count = int(today_receipts_count)
         
         connection.close()
         
         # Get employee information for the template
-        hotel_settings = get_hotel_settings()
         employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
         
         return render_template('receipts.html', 
@@ -9809,227 +10269,134 @@ def receipts():
                              total_receipts=len(receipts_list),
                              total_revenue=total_revenue,
                              today_receipts=today_receipts_count,
-                             hotel_settings=hotel_settings,
                              employee_name=session.get('employee_name'),
                              employee_role=session.get('employee_role'),
                              employee_profile_photo=employee_profile_photo)
         
     except Exception as e:
         print(f"Error fetching receipts: {e}")
-        return render_template('receipts.html', receipts=[], error="Error loading receipts")
-
-@app.route('/api/hotel-settings', methods=['GET'])
-def get_hotel_settings():
-    """Get hotel settings"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
-    connection = get_db_connection()
-    if not connection:
-        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-    
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT * FROM hotel_settings ORDER BY id DESC LIMIT 1")
-            settings = cursor.fetchone()
-            
-            if settings:
-                return jsonify({
-                    'success': True,
-                    'hotel_name': settings[1],
-                    'company_email': settings[2],
-                    'company_phone': settings[3],
-                    'hotel_address': settings[4],
-                    'business_type': settings[5] if len(settings) > 5 else '',
-                    'payment_method': settings[6] if len(settings) > 6 else 'buy_goods',
-                    'till_number': settings[7] if len(settings) > 7 else '',
-                    'business_number': settings[8] if len(settings) > 8 else '',
-                    'account_number': settings[9] if len(settings) > 9 else ''
-                })
-            else:
-                return jsonify({
-                    'success': True,
-                    'hotel_name': '',
-                    'company_email': '',
-                    'company_phone': '',
-                    'hotel_address': '',
-                    'business_type': '',
-                    'payment_method': 'buy_goods',
-                    'till_number': '',
-                    'business_number': '',
-                    'account_number': ''
-                })
+        return render_template('receipts.html', receipts=[], error="Error loading receipts")
+
+@app.route('/api/hotel-settings', methods=['GET'])
+@require_api_role('admin', 'manager')
+def api_get_hotel_settings():
+    """Get hotel settings"""
+    try:
+        settings = fetch_hotel_settings_row()
+        
+        if settings:
+            return jsonify({'success': True, **settings})
+        else:
+            return jsonify({'success': True, **DEFAULT_HOTEL_SETTINGS, 'hotel_name': ''})
     except Exception as e:
         print(f"Error fetching hotel settings: {e}")
         return jsonify({'success': False, 'message': 'Error fetching settings'}), 500
-    finally:
-        connection.close()
 
 @app.route('/api/pos/hotel-settings', methods=['GET'])
 def get_pos_hotel_settings():
     """Get hotel settings for POS (public endpoint)"""
-    connection = get_db_connection()
-    if not connection:
-        return jsonify({'success': False, 'message': 'Database connection failed'}), 500
-    
     try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT * FROM hotel_settings ORDER BY id DESC LIMIT 1")
-            settings = cursor.fetchone()
-            
-            if settings:
-                return jsonify({
-                    'success': True,
-                    'hotel_name': settings[1],
-                    'company_email': settings[2],
-                    'company_phone': settings[3],
-                    'hotel_address': settings[4],
-                    'business_type': settings[5] if len(settings) > 5 else '',
-                    'payment_method': settings[6] if len(settings) > 6 else 'buy_goods',
-                    'till_number': settings[7] if len(settings) > 7 else '',
-                    'business_number': settings[8] if len(settings) > 8 else '',
-                    'account_number': settings[9] if len(settings) > 9 else ''
-                })
-            else:
-                return jsonify({
-                    'success': True,
-                    'hotel_name': 'Hotel POS',
-                    'company_email': '',
-                    'company_phone': '',
-                    'hotel_address': '',
-                    'business_type': '',
-                    'payment_method': 'buy_goods',
-                    'till_number': '',
-                    'business_number': '',
-                    'account_number': ''
-                })
+        settings = fetch_hotel_settings_row()
+        
+        if settings:
+            return jsonify({'success': True, **settings})
+        else:
+            return jsonify({'success': True, **DEFAULT_HOTEL_SETTINGS})
     except Exception as e:
         print(f"Error fetching hotel settings for POS: {e}")
         return jsonify({'success': False, 'message': 'Error fetching settings'}), 500
-    finally:
-        connection.close()
 
 @app.route('/api/manager/dashboard-data', methods=['POST'])
+@require_api_role('admin', 'manager')
 def api_manager_dashboard_data():
     """API endpoint for manager dashboard data"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     try:
         data = request.get_json()
         data_type = data.get('dataType', 'general')  # 'general' or 'verified'
         
-        connection = get_db_connection()
-        if not connection:
-            return jsonify({'success': False, 'message': 'Database connection failed'}), 500
+        cache_key = ('dashboard-data', data_type, datetime.now().strftime('%Y-%m-%d'))
+        cached_payload = get_cached_dashboard_payload(cache_key)
+        if cached_payload is not None:
+            return Response(cached_payload, mimetype='application/json')
+        sales_version = current_sales_version()
+        
+        # Build WHERE clause based on data type
+        where_conditions = []
+        if data_type == 'verified':
+            where_conditions.append("r.status = 'confirmed'")
+        # 'general' includes all statuses (pending, confirmed, cancelled)
+        
+        # Always add the date condition for last 12 months
+        where_conditions.append("r.hour_ts >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)")
+        where_clause = "WHERE " + " AND ".join(where_conditions)
+        
+        # Last-12-month and today's totals from the hourly rollup;
+        # today's figures are conditional aggregates over the same rows
+        today = datetime.now().strftime('%Y-%m-%d')
+        totals_query = f"""
+            SELECT 
+                CAST(COALESCE(SUM(r.tx_count), 0) AS SIGNED) as total_sales,
+                COALESCE(SUM(r.qty), 0) as total_quantity,
+                COALESCE(SUM(r.revenue), 0) as total_revenue,
+                CAST(COALESCE(SUM(CASE WHEN r.hour_ts >= %s THEN r.tx_count END), 0) AS SIGNED) as today_transactions,
+                COALESCE(SUM(CASE WHEN r.hour_ts >= %s THEN r.qty END), 0) as today_quantity,
+                COALESCE(SUM(CASE WHEN r.hour_ts >= %s THEN r.revenue END), 0) as today_revenue
+            FROM {sales_rollup_source()} r
+            {where_clause}
+        """
+        
+        # Get active employees and items counts
+        counts_query = """
+            SELECT 
+                (SELECT COUNT(*) FROM employees WHERE status = 'active') as active_employees,
+                (SELECT COUNT(*) FROM items WHERE status = 'active') as total_items
+        """
+        
+        # The two lookups are independent of each other, so run them in parallel
+        results = run_queries_concurrently({
+            'totals': (totals_query, (today, today, today)),
+            'counts': (counts_query, None)
+        })
+        (total_sales, total_quantity, total_revenue,
+         today_transactions, today_quantity, today_revenue) = results['totals'][0]
+        active_employees, total_items = results['counts'][0]
+        
+        response = json_response({
+            'success': True,
+            'data': {
+                'totalSales': total_sales,
+                'totalQuantity': total_quantity,
+                'totalRevenue': total_revenue,
+                'activeEmployees': active_employees,
+                'totalItems': total_items,
+                'todayTransactions': today_transactions,
+                'todayQuantity': today_quantity,
+                'todayRevenue': today_revenue,
+                'dataType': data_type
+            }
+        })
+        cache_dashboard_payload(cache_key, response.get_data(), sales_version)
+        return response
         
-        with connection.cursor() as cursor:
-            # Build WHERE clause based on data type
-            where_conditions = []
-            if data_type == 'verified':
-                where_conditions.append("s.status = 'confirmed'")
-            # 'general' includes all statuses (pending, confirmed, cancelled)
-            
-            # Always add the date condition for last 12 months
-            where_conditions.append("s.sale_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)")
-            where_clause = "WHERE " + " AND ".join(where_conditions)
-            
-            # Get total sales count
-            sales_query = f"SELECT COUNT(*) FROM sales s {where_clause}"
-            cursor.execute(sales_query)
-            total_sales = cursor.fetchone()[0]
-            
-            # Get total quantity sold
-            quantity_query = f"""
-                SELECT COALESCE(SUM(si.quantity), 0) 
-                FROM sales s 
-                LEFT JOIN sales_items si ON s.id = si.sale_id 
-                {where_clause}
-            """
-            cursor.execute(quantity_query)
-            total_quantity = cursor.fetchone()[0]
-            
-            # Get total revenue
-            revenue_query = f"""
-                SELECT COALESCE(SUM(si.total_price), 0) 
-                FROM sales s 
-                LEFT JOIN sales_items si ON s.id = si.sale_id 
-                {where_clause}
-            """
-            cursor.execute(revenue_query)
-            total_revenue = cursor.fetchone()[0]
-            
-            # Get active employees count
-            employees_query = "SELECT COUNT(*) FROM employees WHERE status = 'active'"
-            cursor.execute(employees_query)
-            active_employees = cursor.fetchone()[0]
-            
-            # Get total items count
-            items_query = "SELECT COUNT(*) FROM items WHERE status = 'active'"
-            cursor.execute(items_query)
-            total_items = cursor.fetchone()[0]
-            
-            # Get today's summary data
-            today = datetime.now().strftime('%Y-%m-%d')
-            today_where = where_clause.replace("s.sale_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)", f"s.sale_date >= '{today}'")
-            
-            # Today's transactions
-            today_sales_query = f"SELECT COUNT(*) FROM sales s {today_where}"
-            cursor.execute(today_sales_query)
-            today_transactions = cursor.fetchone()[0]
-            
-            # Today's quantity sold
-            today_quantity_query = f"""
-                SELECT COALESCE(SUM(si.quantity), 0) 
-                FROM sales s 
-                LEFT JOIN sales_items si ON s.id = si.sale_id 
-                {today_where}
-            """
-            cursor.execute(today_quantity_query)
-            today_quantity = cursor.fetchone()[0]
-            
-            # Today's revenue
-            today_revenue_query = f"""
-                SELECT COALESCE(SUM(si.total_price), 0) 
-                FROM sales s 
-                LEFT JOIN sales_items si ON s.id = si.sale_id 
-                {today_where}
-            """
-            cursor.execute(today_revenue_query)
-            today_revenue = cursor.fetchone()[0]
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'totalSales': total_sales,
-                    'totalQuantity': total_quantity,
-                    'totalRevenue': total_revenue,
-                    'activeEmployees': active_employees,
-                    'totalItems': total_items,
-                    'todayTransactions': today_transactions,
-                    'todayQuantity': today_quantity,
-                    'todayRevenue': today_revenue,
-                    'dataType': data_type
-                }
-            })
-            
     except Exception as e:
         print(f"Error fetching dashboard data: {e}")
         return jsonify({'success': False, 'message': 'Error fetching dashboard data'}), 500
-    finally:
-        if connection:
-            connection.close()
 
 @app.route('/api/manager/today-time-trend', methods=['POST'])
+@require_api_role('admin', 'manager')
 def api_manager_today_time_trend():
     """API endpoint for today's hourly sales trend data"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
+    connection = None
     try:
         data = request.get_json()
         data_type = data.get('dataType', 'general')  # 'general' or 'verified'
         
+        cache_key = ('today-time-trend', data_type, datetime.now().strftime('%Y-%m-%d'))
+        cached_payload = get_cached_dashboard_payload(cache_key)
+        if cached_payload is not None:
+            return Response(cached_payload, mimetype='application/json')
+        sales_version = current_sales_version()
+        
         connection = get_db_connection()
         if not connection:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
@@ -10037,78 +10404,57 @@ def api_manager_today_time_trend():
         with connection.cursor() as cursor:
             # Build WHERE clause based on data type
             where_conditions = []
+            params = []
             if data_type == 'verified':
-                where_conditions.append("s.status = 'confirmed'")
+                where_conditions.append("r.status = 'confirmed'")
             # 'general' includes all statuses (pending, confirmed, cancelled)
             
             # Always add today's date condition
-            today = datetime.now().strftime('%Y-%m-%d')
-            where_conditions.append(f"DATE(s.sale_date) = '{today}'")
+            where_conditions.append("r.hour_ts >= %s AND r.hour_ts < %s")
+            params.extend(date_bounds('single', datetime.now().strftime('%Y-%m-%d')))
             where_clause = "WHERE " + " AND ".join(where_conditions)
             
-            # Get hourly sales data for today
+            # Get hourly sales data for today from the hourly rollup
             hourly_query = f"""
                 SELECT 
-                    HOUR(s.sale_date) as hour,
-                    COALESCE(SUM(si.quantity), 0) as total_quantity,
-                    COUNT(DISTINCT s.id) as transaction_count
-                FROM sales s
-                LEFT JOIN sales_items si ON s.id = si.sale_id
+                    HOUR(r.hour_ts) as hour,
+                    COALESCE(SUM(r.qty), 0) as total_quantity,
+                    CAST(SUM(r.tx_count) AS SIGNED) as transaction_count
+                FROM {sales_rollup_source()} r
                 {where_clause}
-                GROUP BY HOUR(s.sale_date)
-                ORDER BY hour ASC
+                GROUP BY r.hour_ts
+                HAVING SUM(r.tx_count) > 0
+                ORDER BY r.hour_ts ASC
             """
             
-            print(f"Executing hourly query: {hourly_query}")
-            cursor.execute(hourly_query)
+            cursor.execute(hourly_query, params)
             hourly_data = cursor.fetchall()
-            print(f"Hourly data fetched: {hourly_data}")
             
-            # Create a complete 24-hour dataset
+            # Fill fixed 24-slot buckets in one pass over the hours that had sales,
+            # tracking the busiest hour as we go (rows arrive in hour order)
+            hourly_quantities = [0] * 24
+            hourly_transactions = [0] * 24
+            peak_hour = None
+            for hour, quantity, transactions in hourly_data:
+                hourly_quantities[hour] = quantity
+                hourly_transactions[hour] = transactions
+                if peak_hour is None or quantity > hourly_quantities[peak_hour]:
+                    peak_hour = hour
+            
             chart_data = {
-                'labels': [],
-                'quantities': [],
-                'transactions': []
+                'labels': [f"{hour:02d}:00" for hour in range(24)],
+                'quantities': hourly_quantities,
+                'transactions': hourly_transactions
             }
             
-            # Create hourly data for all 24 hours
-            hourly_dict = {row[0]: {'quantity': row[1], 'transactions': row[2]} for row in hourly_data}
-            
-            for hour in range(24):
-                hour_label = f"{hour:02d}:00"
-                chart_data['labels'].append(hour_label)
-                chart_data['quantities'].append(hourly_dict.get(hour, {'quantity': 0})['quantity'])
-                chart_data['transactions'].append(hourly_dict.get(hour, {'transactions': 0})['transactions'])
+            # Get today's summary statistics from the buckets
+            total_quantity = sum(hourly_quantities)
+            total_transactions = sum(hourly_transactions)
+            avg_hourly_quantity = total_quantity / len(hourly_data) if hourly_data else 0
+            peak_hourly_quantity = hourly_quantities[peak_hour] if peak_hour is not None else 0
             
-            # Get today's summary statistics using simple approach
-            try:
-                # Get total quantity and transactions from the hourly data we already have
-                total_quantity = sum(row[1] for row in hourly_data)
-                total_transactions = sum(row[2] for row in hourly_data)
-                
-                # Calculate averages from hourly data
-                if hourly_data:
-                    avg_hourly_quantity = total_quantity / len(hourly_data) if hourly_data else 0
-                    peak_hourly_quantity = max(row[1] for row in hourly_data) if hourly_data else 0
-                    
-                    # Find peak hour
-                    peak_hour_row = max(hourly_data, key=lambda x: x[1])
-                    peak_hour = peak_hour_row[0]
-                else:
-                    avg_hourly_quantity = 0
-                    peak_hourly_quantity = 0
-                    peak_hour = None
-                
-                summary_data = (total_quantity, total_transactions, avg_hourly_quantity, peak_hourly_quantity)
-                peak_hour_data = (peak_hour, peak_hourly_quantity) if peak_hour is not None else None
-                
-                print(f"Summary data calculated from hourly data: {summary_data}")
-                print(f"Peak hour data: {peak_hour_data}")
-                
-            except Exception as e:
-                print(f"Error calculating summary from hourly data: {e}")
-                summary_data = (0, 0, 0, 0)
-                peak_hour_data = None
+            summary_data = (total_quantity, total_transactions, avg_hourly_quantity, peak_hourly_quantity)
+            peak_hour_data = (peak_hour, peak_hourly_quantity) if peak_hour is not None else None
             
             # Prepare summary data
             summary = {
@@ -10119,11 +10465,13 @@ def api_manager_today_time_trend():
                 'peakHour': f"{peak_hour_data[0]:02d}:00" if peak_hour_data and peak_hour_data[0] is not None else "No data"
             }
             
-            return jsonify({
+            response = json_response({
                 'success': True,
                 'chartData': chart_data,
                 'summary': summary
             })
+            cache_dashboard_payload(cache_key, response.get_data(), sales_version)
+            return response
             
     except Exception as e:
         print(f"Error fetching today's time trend data: {e}")
@@ -10133,198 +10481,86 @@ def api_manager_today_time_trend():
             connection.close()
 
 @app.route('/api/manager/monthly-trend', methods=['POST'])
+@require_api_role('admin', 'manager')
 def api_manager_monthly_trend():
     """API endpoint for monthly sales trend data"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
+    connection = None
     try:
         data = request.get_json()
         data_type = data.get('dataType', 'general')  # 'general' or 'verified'
+        if data_type not in MONTHLY_TREND_QUERIES:
+            data_type = 'general'
+        
+        cache_key = ('monthly-trend', data_type, datetime.now().strftime('%Y-%m'))
+        cached_payload = get_cached_dashboard_payload(cache_key)
+        if cached_payload is not None:
+            return Response(cached_payload, mimetype='application/json')
+        sales_version = current_sales_version()
         
         connection = get_db_connection()
         if not connection:
             return jsonify({'success': False, 'message': 'Database connection failed'}), 500
         
-        with connection.cursor() as cursor:
-            # First, let's check if we have any sales data
-            cursor.execute("SELECT COUNT(*) FROM sales")
-            sales_count = cursor.fetchone()[0]
-            print(f"Total sales in database: {sales_count}")
-            
-            cursor.execute("SELECT COUNT(*) FROM sales_items")
-            sales_items_count = cursor.fetchone()[0]
-            print(f"Total sales_items in database: {sales_items_count}")
-            
-            # Test the exact column reference that's failing
-            try:
-                cursor.execute("SELECT si.quantity FROM sales_items si LIMIT 1")
-                test_result = cursor.fetchone()
-                print(f"Test si.quantity query successful: {test_result}")
-            except Exception as e:
-                print(f"Test si.quantity query failed: {e}")
-            
-            # Check current database
-            cursor.execute("SELECT DATABASE()")
-            current_db = cursor.fetchone()[0]
-            print(f"Current database: {current_db}")
-            
-            # Check if sales_items table exists in current database
-            cursor.execute("SHOW TABLES LIKE 'sales_items'")
-            table_exists = cursor.fetchone()
-            print(f"sales_items table exists: {table_exists is not None}")
-            
-            # Build WHERE clause based on data type
-            where_conditions = []
-            if data_type == 'verified':
-                where_conditions.append("s.status = 'confirmed'")
-            # 'general' includes all statuses (pending, confirmed, cancelled)
-            
-            # Always add the date condition
-            where_conditions.append("s.sale_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)")
-            
-            where_clause = "WHERE " + " AND ".join(where_conditions)
-            print(f"WHERE clause: {where_clause}")
-            
-            # Get monthly sales data for the last 12 months - simplified to match working test query
-            monthly_query = f"""
-                SELECT 
-                    DATE_FORMAT(s.sale_date, '%Y-%m') as month,
-                    SUM(si.quantity) as total_quantity
-                FROM sales s
-                LEFT JOIN sales_items si ON s.id = si.sale_id
-                {where_clause}
-                GROUP BY DATE_FORMAT(s.sale_date, '%Y-%m')
-                ORDER BY month ASC
-            """
-            
-            print(f"Executing monthly query: {monthly_query}")
-            
-            # Let's test the connection and tables first
-            cursor.execute("SELECT DATABASE()")
-            current_db = cursor.fetchone()[0]
-            print(f"Current database in Flask: {current_db}")
-            
-            cursor.execute("SHOW TABLES LIKE 'sales_items'")
-            table_exists = cursor.fetchone()
-            print(f"sales_items table exists in Flask: {table_exists is not None}")
-            
-            # Test a simple join first
-            try:
-                cursor.execute("SELECT s.id, si.quantity FROM sales s LEFT JOIN sales_items si ON s.id = si.sale_id LIMIT 1")
-                simple_join_result = cursor.fetchone()
-                print(f"Simple join test in Flask: {simple_join_result}")
-            except Exception as e:
-                print(f"Simple join test failed in Flask: {e}")
-            
-            # Test the exact same structure but with aggregation
-            try:
-                test_agg_query = """
-                    SELECT 
-                        DATE_FORMAT(s.sale_date, '%Y-%m') as month,
-                        SUM(si.quantity) as total_quantity
-                    FROM sales s
-                    LEFT JOIN sales_items si ON s.id = si.sale_id
-                    WHERE s.sale_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-                    GROUP BY DATE_FORMAT(s.sale_date, '%Y-%m')
-                    LIMIT 1
-                """
-                cursor.execute(test_agg_query)
-                test_agg_result = cursor.fetchone()
-                print(f"Test aggregation query result: {test_agg_result}")
-            except Exception as e:
-                print(f"Test aggregation query failed: {e}")
-            
-            # Use the exact same query that works in the test
-            working_query = """
-                SELECT 
-                    DATE_FORMAT(s.sale_date, '%Y-%m') as month,
-                    SUM(si.quantity) as total_quantity
-                FROM sales s
-                LEFT JOIN sales_items si ON s.id = si.sale_id
-                WHERE s.sale_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-                GROUP BY DATE_FORMAT(s.sale_date, '%Y-%m')
-                ORDER BY month ASC
-            """
-            print(f"Using working query instead of monthly_query")
-            cursor.execute(working_query)
-            monthly_data = cursor.fetchall()
-            print(f"Monthly data fetched successfully: {monthly_data}")
+        # At most 13 rows come back, so a buffered cursor is the right fit
+        with connection.cursor(pymysql.cursors.Cursor) as cursor:
+            # Month bounds come from Python so the statement text never changes
+            # and the months line up with the cache key
+            today = datetime.now()
+            first_year, first_month = divmod(today.year * 12 + today.month - 12, 12)
+            month_bounds = (datetime(first_year, first_month + 1, 1).date(), today.replace(day=1).date())
+            cursor.execute(MONTHLY_TREND_QUERIES[data_type], month_bounds)
+            rollup_data = cursor.fetchall()
+            monthly_data = sorted(row for row in rollup_data if row[0] is not None)
+            total_row = next((row for row in rollup_data if row[0] is None), None)
+            app.logger.debug("Monthly data fetched successfully: %s", monthly_data)
             
             # Get summary statistics using simple approach
             try:
-                summary_query = """
-                    SELECT 
-                        SUM(si.quantity) as total_quantity
-                    FROM sales s
-                    LEFT JOIN sales_items si ON s.id = si.sale_id
-                    WHERE s.sale_date >= DATE_SUB(CURDATE(), INTERVAL 12 MONTH)
-                """
-                cursor.execute(summary_query)
-                total_result = cursor.fetchone()
-                total_quantity = total_result[0] if total_result and total_result[0] else 0
-                
-                # Calculate average from the monthly data we already have
-                if monthly_data:
-                    monthly_quantities = [row[1] for row in monthly_data if row[1]]
-                    average_monthly = sum(monthly_quantities) / len(monthly_quantities) if monthly_quantities else 0
-                    max_monthly = max(monthly_quantities) if monthly_quantities else 0
-                else:
-                    average_monthly = 0
-                    max_monthly = 0
+                total_quantity = total_row[2] if total_row and total_row[2] else 0
+                
+                # Average, max and best month over months with sales, in one pass
+                active_months = 0
+                active_quantity = 0
+                best_month_row = None
+                for row in monthly_data:
+                    if row[2]:
+                        active_months += 1
+                        active_quantity += row[2]
+                        if best_month_row is None or row[2] > best_month_row[2]:
+                            best_month_row = row
+                average_monthly = active_quantity / active_months if active_months else 0
+                max_monthly = best_month_row[2] if best_month_row else 0
                 
                 summary_data = (total_quantity, average_monthly, max_monthly)
-                print(f"Summary data calculated: {summary_data}")
+                app.logger.debug("Summary data calculated: %s", summary_data)
             except Exception as e:
-                print(f"Error calculating summary: {e}")
+                app.logger.error("Error calculating summary: %s", e)
                 summary_data = (0, 0, 0)
+                best_month_row = None
             
             # Get the best month name from the monthly data we already have
             try:
-                if monthly_data:
-                    # Find the month with the highest quantity
-                    best_month_row = max(monthly_data, key=lambda x: x[1])
+                if best_month_row:
                     best_month_key = best_month_row[0]  # e.g., '2025-09'
-                    best_quantity = best_month_row[1]
+                    best_quantity = best_month_row[2]
                     
                     # Convert month key to readable format
-                    from datetime import datetime, timedelta
-                    month_date = datetime.strptime(best_month_key, '%Y-%m')
-                    best_month_name = month_date.strftime('%B %Y')  # e.g., 'September 2025'
+                    best_year, best_month = best_month_key.split('-')
+                    best_month_name = f"{calendar.month_name[int(best_month)]} {best_year}"  # e.g., 'September 2025'
                     best_month_data = (best_month_name, best_quantity)
                 else:
                     best_month_data = None
-                print(f"Best month data: {best_month_data}")
+                app.logger.debug("Best month data: %s", best_month_data)
             except Exception as e:
-                print(f"Error calculating best month: {e}")
+                app.logger.error("Error calculating best month: %s", e)
                 best_month_data = None
             
-            # Prepare chart data
+            # Prepare chart data; the query already returns all 12 months in order
             chart_data = {
-                'labels': [],
-                'quantities': []
+                'labels': [row[1] for row in monthly_data],
+                'quantities': [row[2] for row in monthly_data]
             }
             
-            # Create a complete 12-month dataset
-            from datetime import datetime, timedelta, timedelta
-            import calendar
-            
-            current_date = datetime.now()
-            for i in range(12):
-                month_date = current_date - timedelta(days=30*i)
-                month_key = month_date.strftime('%Y-%m')
-                month_name = calendar.month_name[month_date.month][:3]  # Short month name
-                
-                # Find data for this month (simplified query returns only 2 columns: month, total_quantity)
-                month_quantity = 0
-                for row in monthly_data:
-                    if row[0] == month_key:
-                        month_quantity = row[1]  # Changed from row[3] to row[1]
-                        break
-                
-                chart_data['labels'].insert(0, f"{month_name} {month_date.year}")
-                chart_data['quantities'].insert(0, month_quantity)
-            
             # Prepare summary data
             summary = {
                 'totalQuantity': summary_data[0] if summary_data and summary_data[0] else 0,
@@ -10332,42 +10568,53 @@ def api_manager_monthly_trend():
                 'bestMonth': f"{best_month_data[0]} {best_month_data[1]}" if best_month_data and best_month_data[0] else "No data"
             }
             
-            return jsonify({
+            response = json_response({
                 'success': True,
                 'chartData': chart_data,
                 'summary': summary
             })
+            cache_dashboard_payload(cache_key, response.get_data(), sales_version)
+            return response
             
     except Exception as e:
-        print(f"Error fetching monthly trend data: {e}")
+        app.logger.error("Error fetching monthly trend data: %s", e)
         return jsonify({'success': False, 'message': 'Error fetching monthly trend data'}), 500
     finally:
         if connection:
             connection.close()
 
+# Hotel settings validation rules: always-required fields, then the fields each
+# payment method needs together with the message shown when any is missing
+HOTEL_SETTINGS_REQUIRED_FIELDS = ('hotel_name', 'company_email', 'company_phone', 'payment_method')
+PAYMENT_METHOD_REQUIRED_FIELDS = {
+    'buy_goods': (('till_number',), 'Till number is required for buy goods payment method'),
+    'paybill': (('business_number', 'account_number'), 'Business number and account number are required for paybill payment method'),
+}
+
+def validate_hotel_settings(data):
+    """Return the first validation error message for hotel settings data, or None"""
+    missing = next((field for field in HOTEL_SETTINGS_REQUIRED_FIELDS if not data.get(field)), None)
+    if missing:
+        return f'{missing} is required'
+    method_fields, message = PAYMENT_METHOD_REQUIRED_FIELDS.get(data['payment_method'], ((), None))
+    if not all(data.get(field) for field in method_fields):
+        return message
+    return None
+
 @app.route('/api/hotel-settings', methods=['POST'])
+@require_api_role('admin', 'manager')
 def save_hotel_settings():
     """Save hotel settings"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+    if not request.is_json:
+        return jsonify({'success': False, 'message': 'No data provided'}), 400
     
-    data = request.get_json()
+    data = request.get_json(silent=True)
     if not data:
         return jsonify({'success': False, 'message': 'No data provided'}), 400
     
-    # Validate required fields
-    required_fields = ['hotel_name', 'company_email', 'company_phone', 'payment_method']
-    for field in required_fields:
-        if not data.get(field):
-            return jsonify({'success': False, 'message': f'{field} is required'}), 400
-    
-    # Validate payment method specific fields
-    if data['payment_method'] == 'buy_goods' and not data.get('till_number'):
-        return jsonify({'success': False, 'message': 'Till number is required for buy goods payment method'}), 400
-    
-    if data['payment_method'] == 'paybill':
-        if not data.get('business_number') or not data.get('account_number'):
-            return jsonify({'success': False, 'message': 'Business number and account number are required for paybill payment method'}), 400
+    validation_error = validate_hotel_settings(data)
+    if validation_error:
+        return jsonify({'success': False, 'message': validation_error}), 400
     
     connection = get_db_connection()
     if not connection:
@@ -10375,57 +10622,39 @@ def save_hotel_settings():
     
     try:
         with connection.cursor() as cursor:
-            # Check if settings already exist
-            cursor.execute("SELECT id FROM hotel_settings ORDER BY id DESC LIMIT 1")
-            existing_settings = cursor.fetchone()
-            
-            if existing_settings:
-                # Update existing settings
-                cursor.execute("""
-                    UPDATE hotel_settings SET
-                        hotel_name = %s,
-                        company_email = %s,
-                        company_phone = %s,
-                        hotel_address = %s,
-                        business_type = %s,
-                        payment_method = %s,
-                        till_number = %s,
-                        business_number = %s,
-                        account_number = %s,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s
-                """, (
-                    data['hotel_name'],
-                    data['company_email'],
-                    data['company_phone'],
-                    data.get('hotel_address', ''),
-                    data.get('business_type', ''),
-                    data['payment_method'],
-                    data.get('till_number', ''),
-                    data.get('business_number', ''),
-                    data.get('account_number', ''),
-                    existing_settings[0]
-                ))
-            else:
-                # Insert new settings
-                cursor.execute("""
-                    INSERT INTO hotel_settings (
-                        hotel_name, company_email, company_phone, hotel_address,
-                        business_type, payment_method, till_number, business_number, account_number
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    data['hotel_name'],
-                    data['company_email'],
-                    data['company_phone'],
-                    data.get('hotel_address', ''),
-                    data.get('business_type', ''),
-                    data['payment_method'],
-                    data.get('till_number', ''),
-                    data.get('business_number', ''),
-                    data.get('account_number', '')
-                ))
+            # Update the current (latest) settings row, or create it when there is none
+            cursor.execute("""
+                INSERT INTO hotel_settings (
+                    id, hotel_name, company_email, company_phone, hotel_address,
+                    business_type, payment_method, till_number, business_number, account_number
+                )
+                SELECT latest.id, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                FROM (SELECT COALESCE(MAX(id), 1) AS id FROM hotel_settings) AS latest
+                ON DUPLICATE KEY UPDATE
+                    hotel_name = VALUES(hotel_name),
+                    company_email = VALUES(company_email),
+                    company_phone = VALUES(company_phone),
+                    hotel_address = VALUES(hotel_address),
+                    business_type = VALUES(business_type),
+                    payment_method = VALUES(payment_method),
+                    till_number = VALUES(till_number),
+                    business_number = VALUES(business_number),
+                    account_number = VALUES(account_number),
+                    updated_at = CURRENT_TIMESTAMP
+            """, (
+                data['hotel_name'],
+                data['company_email'],
+                data['company_phone'],
+                data.get('hotel_address', ''),
+                data.get('business_type', ''),
+                data['payment_method'],
+                data.get('till_number', ''),
+                data.get('business_number', ''),
+                data.get('account_number', '')
+            ))
             
             connection.commit()
+            invalidate_hotel_settings_cache()
             return jsonify({'success': True, 'message': 'Hotel settings saved successfully'})
             
     except Exception as e:
@@ -10436,11 +10665,9 @@ def save_hotel_settings():
 
 # Printing Settings API Endpoints
 @app.route('/api/printing-settings', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_printing_settings():
     """Get printing settings from hotel_settings table"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection failed'}), 500
@@ -10480,11 +10707,9 @@ def get_printing_settings():
         connection.close()
 
 @app.route('/api/printing-settings', methods=['POST'])
+@require_api_role('admin', 'manager')
 def save_printing_settings():
     """Save printing settings"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json()
     if not data:
         return jsonify({'success': False, 'message': 'No data provided'}), 400
@@ -10528,6 +10753,7 @@ def save_printing_settings():
                 ))
             
             connection.commit()
+            invalidate_hotel_settings_cache()
             return jsonify({'success': True, 'message': 'Printing settings saved successfully'})
             
     except Exception as e:
@@ -10537,11 +10763,9 @@ def save_printing_settings():
         connection.close()
 # Permissions Settings API Endpoints
 @app.route('/api/permissions-settings', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_permissions_settings():
     """Get permissions settings from hotel_settings table"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection failed'}), 500
@@ -10568,11 +10792,9 @@ def get_permissions_settings():
         connection.close()
 
 @app.route('/api/permissions-settings', methods=['POST'])
+@require_api_role('admin', 'manager')
 def save_permissions_settings():
     """Save permissions settings"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json()
     if not data:
         return jsonify({'success': False, 'message': 'No data provided'}), 400
@@ -10610,6 +10832,7 @@ def save_permissions_settings():
                 ))
             
             connection.commit()
+            invalidate_hotel_settings_cache()
             return jsonify({'success': True, 'message': 'Permissions settings saved successfully'})
             
     except Exception as e:
@@ -10620,11 +10843,9 @@ def save_permissions_settings():
 
 # Receipt Reset by Date API Endpoints
 @app.route('/api/receipts/count-by-date', methods=['GET'])
+@require_api_role('admin', 'manager')
 def count_receipts_by_date():
     """Get count of receipts for a specific date"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     selected_date = request.args.get('date')
     if not selected_date:
         return jsonify({'success': False, 'message': 'Date is required'}), 400
@@ -10666,11 +10887,9 @@ def count_receipts_by_date():
         connection.close()
 
 @app.route('/api/receipts/reset-status-by-date', methods=['POST'])
+@require_api_role('admin', 'manager')
 def reset_receipt_status_by_date():
     """Reset receipt status to 'pending' for all receipts on a specific date"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json()
     if not data or 'date' not in data:
         return jsonify({'success': False, 'message': 'Date is required'}), 400
@@ -10692,6 +10911,7 @@ def reset_receipt_status_by_date():
             
             updated_count = cursor.rowcount
             connection.commit()
+            invalidate_dashboard_cache()
             
             return jsonify({
                 'success': True,
@@ -10706,11 +10926,9 @@ def reset_receipt_status_by_date():
         connection.close()
 
 @app.route('/api/receipts/reset-cashier-confirmation-by-date', methods=['POST'])
+@require_api_role('admin', 'manager')
 def reset_cashier_confirmation_by_date():
     """Reset cashier_confirmed to 0 for all receipts on a specific date"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json()
     if not data or 'date' not in data:
         return jsonify({'success': False, 'message': 'Date is required'}), 400
@@ -10747,11 +10965,9 @@ def reset_cashier_confirmation_by_date():
 
 # Display Settings API Endpoints
 @app.route('/api/display-settings', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_display_settings():
     """Get display settings from hotel_settings table"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection failed'}), 500
@@ -10791,11 +11007,9 @@ def get_display_settings():
         connection.close()
 
 @app.route('/api/display-settings', methods=['POST'])
+@require_api_role('admin', 'manager')
 def save_display_settings():
     """Save display settings"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json()
     if not data:
         return jsonify({'success': False, 'message': 'No data provided'}), 400
@@ -10839,6 +11053,7 @@ def save_display_settings():
                 ))
             
             connection.commit()
+            invalidate_hotel_settings_cache()
             return jsonify({'success': True, 'message': 'Display settings saved successfully'})
             
     except Exception as e:
@@ -10848,11 +11063,9 @@ def save_display_settings():
         connection.close()
 
 @app.route('/api/receipt-settings', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_receipt_settings():
     """Get receipt settings from hotel_settings table"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection failed'}), 500
@@ -10930,11 +11143,9 @@ def get_receipt_settings():
         connection.close()
 
 @app.route('/api/receipt-settings', methods=['POST'])
+@require_api_role('admin', 'manager')
 def save_receipt_settings():
     """Save receipt settings"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json()
     if not data:
         return jsonify({'success': False, 'message': 'No data provided'}), 400
@@ -11024,6 +11235,7 @@ def save_receipt_settings():
                 ))
             
             connection.commit()
+            invalidate_hotel_settings_cache()
             return jsonify({'success': True, 'message': 'Receipt settings saved successfully'})
             
     except Exception as e:
@@ -11033,11 +11245,9 @@ def save_receipt_settings():
         connection.close()
 
 @app.route('/api/receipt-logo/upload', methods=['POST'])
+@require_api_role('admin', 'manager')
 def upload_receipt_logo():
     """Upload receipt logo"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     if 'logo' not in request.files:
         return jsonify({'success': False, 'message': 'No logo file provided'}), 400
     
@@ -11064,11 +11274,9 @@ def upload_receipt_logo():
         return jsonify({'success': False, 'message': 'Invalid file type. Please upload an image file.'}), 400
 
 @app.route('/api/receipt-logo/remove', methods=['POST'])
+@require_api_role('admin', 'manager')
 def remove_receipt_logo():
     """Remove receipt logo"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-    
     data = request.get_json()
     if not data or not data.get('remove'):
         return jsonify({'success': False, 'message': 'Invalid request'}), 400
@@ -11086,6 +11294,7 @@ def remove_receipt_logo():
                 WHERE id = (SELECT id FROM hotel_settings ORDER BY id DESC LIMIT 1)
             """)
             connection.commit()
+            invalidate_hotel_settings_cache()
             return jsonify({'success': True, 'message': 'Logo removed successfully'})
     except Exception as e:
         print(f"Error removing logo: {e}")
@@ -11229,15 +11438,15 @@ def api_admin_live_analytics():
                 SELECT COALESCE(SUM(si.total_price), 0) as live_revenue
                 FROM sales s 
                 LEFT JOIN sales_items si ON s.id = si.sale_id 
-                WHERE DATE(s.sale_date) = CURDATE() AND {status_condition}
+                WHERE s.sale_date >= CURDATE() AND s.sale_date < CURDATE() + INTERVAL 1 DAY AND {status_condition}
             """)
             live_revenue = cursor.fetchone()[0]
             
             # Get live transaction count (today's transactions)
             cursor.execute(f"""
                 SELECT COUNT(*) as live_transactions
-                FROM sales 
-                WHERE DATE(sale_date) = CURDATE() AND {status_condition.replace('s.', '')}
+                FROM sales s
+                WHERE s.sale_date >= CURDATE() AND s.sale_date < CURDATE() + INTERVAL 1 DAY AND {status_condition}
             """)
             live_transactions = cursor.fetchone()[0]
             
@@ -11246,7 +11455,7 @@ def api_admin_live_analytics():
                 SELECT COALESCE(SUM(si.quantity), 0) as live_quantity
                 FROM sales s 
                 LEFT JOIN sales_items si ON s.id = si.sale_id 
-                WHERE DATE(s.sale_date) = CURDATE() AND {status_condition}
+                WHERE s.sale_date >= CURDATE() AND s.sale_date < CURDATE() + INTERVAL 1 DAY AND {status_condition}
             """)
             live_quantity = cursor.fetchone()[0]
             
@@ -11254,7 +11463,7 @@ def api_admin_live_analytics():
             cursor.execute(f"""
                 SELECT e.full_name, COALESCE(SUM(si.total_price), 0) as total_sales
                 FROM employees e
-                LEFT JOIN sales s ON e.id = s.employee_id AND DATE(s.sale_date) = CURDATE() AND {status_condition}
+                LEFT JOIN sales s ON e.id = s.employee_id AND s.sale_date >= CURDATE() AND s.sale_date < CURDATE() + INTERVAL 1 DAY AND {status_condition}
                 LEFT JOIN sales_items si ON s.id = si.sale_id
                 WHERE e.status = 'active'
                 GROUP BY e.id, e.full_name
@@ -11271,7 +11480,7 @@ def api_admin_live_analytics():
             cursor.execute(f"""
                 SELECT e.full_name, COALESCE(SUM(si.total_price), 0) as total_sales
                 FROM employees e
-                LEFT JOIN sales s ON e.id = s.employee_id AND DATE(s.sale_date) = CURDATE() AND {status_condition}
+                LEFT JOIN sales s ON e.id = s.employee_id AND s.sale_date >= CURDATE() AND s.sale_date < CURDATE() + INTERVAL 1 DAY AND {status_condition}
                 LEFT JOIN sales_items si ON s.id = si.sale_id
                 WHERE e.status = 'active'
                 GROUP BY e.id, e.full_name
@@ -11314,7 +11523,7 @@ def api_admin_live_analytics():
                        COUNT(DISTINCT s.id) as transactions
                 FROM sales s 
                 LEFT JOIN sales_items si ON s.id = si.sale_id 
-                WHERE DATE(s.sale_date) = CURDATE() AND {status_condition}
+                WHERE s.sale_date >= CURDATE() AND s.sale_date < CURDATE() + INTERVAL 1 DAY AND {status_condition}
                 GROUP BY HOUR(s.sale_date)
                 ORDER BY hour
             """)
@@ -12386,11 +12595,9 @@ def wifi_thermal_printer_management():
     return render_template('wifi_thermal_printer_management.html')
 
 @app.route('/api/payroll/all', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_all_payrolls():
     """Fetch all payroll profiles with employee details (active only, admin/manager only)"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
@@ -12413,11 +12620,9 @@ def get_all_payrolls():
         connection.close()
 
 @app.route('/api/payroll/record-payment', methods=['POST'])
+@require_api_role('admin', 'manager')
 def record_payroll_payment():
     """Record a salary payment for an employee (admin/manager only)"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-
     data = request.get_json() or {}
     required = ['employee_id', 'amount', 'payment_date']
     for field in required:
@@ -12486,12 +12691,9 @@ def record_payroll_payment():
         connection.close()
 
 @app.route('/admin/payroll-transactions/<int:employee_id>')
+@require_role('admin', 'manager')
 def view_payroll_transactions(employee_id):
     """View payroll payment transactions for a specific employee"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return redirect(url_for('index'))
-    
-    hotel_settings = get_hotel_settings()
     employee_profile_photo = get_employee_profile_photo(session.get('employee_id'))
     
     # Get employee details for the header
@@ -12518,15 +12720,12 @@ def view_payroll_transactions(employee_id):
                          employee_name=session.get('employee_name'),
                          employee_role=session.get('employee_role'),
                          employee_profile_photo=employee_profile_photo,
-                         hotel_settings=hotel_settings,
                          employee_info=employee_info)
 
 @app.route('/api/payroll/transactions/<int:employee_id>', methods=['GET'])
+@require_api_role('admin', 'manager')
 def get_payroll_transactions(employee_id):
     """Get all payroll payment transactions for an employee"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-
     connection = get_db_connection()
     if not connection:
         return jsonify({'success': False, 'message': 'Database connection error'}), 500
@@ -12636,11 +12835,9 @@ def get_payroll_transactions(employee_id):
         connection.close()
 
 @app.route('/api/payroll/transactions/<int:transaction_id>', methods=['PUT'])
+@require_api_role('admin', 'manager')
 def update_payroll_transaction(transaction_id):
     """Update a payroll payment transaction (admin/manager only)"""
-    if 'employee_id' not in session or session.get('employee_role') not in ['admin', 'manager']:
-        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
-
     data = request.get_json() or {}
     required = ['amount', 'payment_date']
     for field in required:
@@ -12712,6 +12909,11 @@ def update_payroll_transaction(transaction_id):
     finally:
         connection.close()
 
+@app.cli.command('init-db')
+def init_db_command():
+    """Create or migrate the database schema; run once per deployment"""
+    init_database()
+
 if __name__ == '__main__':
     init_database()
     create_sample_data()